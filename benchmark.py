@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import igraph as ig
+import numpy as np
+import ifunctions as f # functions with igraph
+import matrixstore as ms # binary landmark matrices
+import paths as lp # landmark paths
+import reduction as rd # degree-1 peeling and twin contraction
+
+# Benchmark of the offline and online phases on synthetic graphs (small world and Barabasi-Albert of several sizes).
+# Every stage is timed on its own: load (the graph is written as an edge list and read back with read_graph_file),
+# LCC, each landmark selection method, the matrix build, the real distances and the estimation. For every stage the
+# report has the wall time, the peak RSS so far (this process and its pool workers) and a throughput where it applies.
+# The paths stage compares landmark paths (paths.py) with G.get_shortest_paths. The reduction stage reduces the graph
+# to its core (reduction.py) and repeats the matrix build and the real distances there, its record has the reduction
+# ratio and the end-to-end speedup of those two stages. The directed stage checks the forward and backward matrices
+# and the real distances of a small directed graph against G.distances(mode="out").
+# The report is written as JSON and CSV, --compare checks it against an older report and exits with 1 on a regression.
+GRAPHS = {"smallworld": [2000, 8000], "barabasi": [2000, 8000, 32000]}
+METHODS = ["R", "D", "PR", "C", "SB", "DP", "FP"]
+NUM_LANDMARKS = 100
+LANDMARK_RANGE = [10, 50, 100]
+NUM_PAIRS = 2000
+PATH_PAIRS = 200 # pairs for the comparison of landmark paths with G.get_shortest_paths
+THRESHOLD = 1.2 # a stage that is this many times slower than before is a regression
+DIRECTED_SIZE = 1000 # vertices of the directed graph that is checked against igraph
+
+#*******************************************************************************
+
+# Peak resident set size in MB of this process and of its (finished) child processes
+def peak_rss():
+	scale = 1 if sys.platform == "darwin" else 1024 # ru_maxrss is in bytes on macOS and in KB on Linux
+	own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+	return max(own, children) / 2**20
+
+#------------------------------------------------------------------------------#
+# Time a stage with the progress bars silenced, the record is appended to records
+@contextlib.contextmanager
+def stage(records, graph, name, items=None, unit=None):
+	record = {"graph": graph, "stage": name}
+	tik = time.perf_counter()
+	with contextlib.redirect_stdout(io.StringIO()): yield record
+	record["seconds"] = time.perf_counter() - tik
+	record["peak_rss_mb"] = peak_rss()
+	if items is not None: record["throughput"], record["unit"] = items / max(record["seconds"], 1e-9), unit
+	records.append(record)
+	print(f"{graph:>18} {name:<28} {record['seconds']:9.3f}s {record['peak_rss_mb']:9.1f}MB" +
+		  (f" {record['throughput']:12.1f} {unit}" if items is not None else ""), flush=True)
+
+#------------------------------------------------------------------------------#
+def make_graph(kind, size, seed):
+	random.seed(seed) # igraph's generators use the random module
+	if kind == "smallworld": return f.create_smallworld_graph(size) # may be None when the rewired graph is not connected
+	G = ig.Graph.Barabasi(size, 3, directed=False)
+	G.vs["id"] = list(range(size))
+	return G
+
+#*******************************************************************************
+
+def run_graph(records, kind, size, workdir, methods, processes, seed):
+	name = f"{kind}-{size}"
+	G = make_graph(kind, size, seed)
+	if G is None: G = ig.Graph.Watts_Strogatz(1, size, 5, 0.05)
+	path = os.path.join(workdir, f"out.{name}")
+	with open(path, 'w') as file:
+		for a, b in G.get_edgelist(): file.write(f"{a} {b}\n")
+
+	with stage(records, name, "load", G.ecount(), "edges/s"): G = f.read_graph_file(path, use_sidecar=False)
+	with stage(records, name, "lcc"): G = f.largest_cc(G)
+	fingerprint = f.graph_fingerprint(G)
+
+	Landmarks = {}
+	for method in methods:
+		with stage(records, name, f"selection-{method}"):
+			Landmarks[method] = f.LandmarkSelection(G, method, NUM_LANDMARKS, scores=f.CentralityScores(G, method, seed=seed, processes=processes), seed=seed)
+
+	pairs = f.SelectRandomNodePairs(G, NUM_PAIRS, seed)
+	columns = sorted(set(node for pair in pairs for node in pair))
+	paths = {method: os.path.join(workdir, f"{name}-{method}") for method in methods}
+	with stage(records, name, "matrix-build", len(methods) * NUM_LANDMARKS, "BFS/s"):
+		f.calc_landmark_matrices(G, Landmarks, paths, methods, nodes=columns, processes=processes, fingerprint=fingerprint)
+
+	with stage(records, name, "real-distances", len(pairs), "pairs/s"):
+		f.CalcAndStoreRealDist(G, pairs, workdir+os.sep, name, processes=processes)
+
+	with stage(records, name, "estimation", len(methods) * len(pairs), "pairs/s"):
+		for method in methods:
+			matrix, header = ms.open_matrix(paths[method])
+			f.CalcEstimateDistRange(matrix, ms.node_index(header), pairs, LANDMARK_RANGE)
+			del matrix
+
+	# the same matrix build and real distances on the reduced core, the pairs are translated there and back
+	with stage(records, name, "reduction") as reduced:
+		reduction = rd.reduce_graph(G, seed=seed)
+		core = rd.core_graph(G, reduction)
+	reduced.update(rd.reduction_report(G, core, reduction, seed=seed))
+	core_pairs, extra, solved = rd.translate_pairs(reduction, pairs)
+	core_columns = sorted(set(core_pairs.ravel().tolist()))
+	core_landmarks = {method: f.LandmarkSelection(core, method, min(NUM_LANDMARKS, core.vcount()), seed=seed) for method in methods}
+	with stage(records, name, "matrix-build-core", len(methods) * NUM_LANDMARKS, "BFS/s"):
+		f.calc_landmark_matrices(core, core_landmarks, {method: paths[method]+"-core" for method in methods}, methods, nodes=core_columns, processes=processes)
+	with stage(records, name, "real-distances-core", len(pairs), "pairs/s"):
+		core_distances = f.CalcAndStoreRealDist(core, core_pairs, workdir+os.sep, name+"-core", processes=processes)
+	real_distances = np.load(os.path.join(workdir, f"{name}_real_distances.npy")).astype(np.float64)
+	if not np.array_equal(rd.expand_distances(core_distances, extra, solved), real_distances): print(f"{name}: the translated core distances differ from the real distances")
+	seconds = {record["stage"]: record["seconds"] for record in records if record["graph"] == name}
+	reduced["end_to_end_speedup"] = (seconds["matrix-build"] + seconds["real-distances"]) / max(seconds["matrix-build-core"] + seconds["real-distances-core"], 1e-9)
+
+	# landmark paths against G.get_shortest_paths, the record gets the stretch and the query rates of both
+	with stage(records, name, "paths") as record:
+		method = methods[0]
+		f.calc_landmark_matrices(G, Landmarks, {method: paths[method]+"-paths"}, [method], nodes=columns, processes=processes, fingerprint=fingerprint, parents=True)
+		record.update(lp.compare_with_igraph(G, lp.LandmarkPaths(paths[method]+"-paths", G=G), pairs[:PATH_PAIRS]))
+
+#------------------------------------------------------------------------------#
+# Landmark matrices (from and towards the landmarks) and real distances of a directed graph against igraph, with
+# processes 1 and the pool, the record has the number of distances that differ
+def check_directed(records, workdir, processes, seed):
+	random.seed(seed)
+	G = f.largest_cc(ig.Graph.Erdos_Renyi(DIRECTED_SIZE, m=4*DIRECTED_SIZE, directed=True))
+	G.vs["name"] = [str(v) for v in range(G.vcount())]
+	exact = np.asarray(G.distances(mode="out"), dtype=np.float64)
+	landmarks = random.sample(range(G.vcount()), 10)
+	pairs = f.SelectRandomNodePairs(G, NUM_PAIRS, seed)
+	with stage(records, "directed", "directed-check") as record:
+		mismatches = 0
+		for workers in (1, processes):
+			path = os.path.join(workdir, f"directed-{workers}")
+			f.calc_landmark_matrices(G, {"R": landmarks}, {"R": path}, ["R"], processes=workers)
+			for matrix_path, expected in ((path, exact[landmarks]), (ms.backward_path(path), exact[:, landmarks].T)):
+				matrix, _ = ms.open_matrix(matrix_path)
+				found = np.where(matrix == ms.unreachable_value(matrix.dtype), np.inf, matrix.astype(np.float64))
+				mismatches += int((found != expected).sum())
+				del matrix
+			real = f.CalcAndStoreRealDist(G, pairs, workdir+os.sep, f"directed-{workers}", processes=workers)
+			mismatches += int((real != exact[tuple(np.asarray(pairs).T)]).sum())
+		record["mismatches"] = mismatches
+	if mismatches: print(f"directed: {mismatches} distances differ from G.distances(mode=\"out\")")
+
+#------------------------------------------------------------------------------#
+def write_report(records, path):
+	with open(path+".json", 'w') as file:
+		json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "records": records}, file, indent=1)
+	with open(path+".csv", 'w', newline="") as file:
+		writer = csv.DictWriter(file, fieldnames=["graph", "stage", "seconds", "peak_rss_mb", "throughput", "unit",
+												  "mean_stretch", "exact_share", "landmark_queries_per_s", "igraph_queries_per_s",
+													  "vertex_ratio", "edge_ratio", "bfs_speedup", "end_to_end_speedup", "mismatches"], extrasaction="ignore")
+		writer.writeheader()
+		writer.writerows(records)
+	print(f"Report is stored as {path}.json and {path}.csv")
+
+#------------------------------------------------------------------------------#
+# Compare the stages with an older report, returns the stages that got slower by more than threshold
+def compare(records, old_path, threshold=THRESHOLD):
+	with open(old_path, 'r') as file:
+		old = {(r["graph"], r["stage"]): r for r in json.load(file)["records"]}
+	regressions = []
+	print(f"\n{'graph':>18} {'stage':<28} {'before':>9} {'now':>9} {'ratio':>7}")
+	for record in records:
+		before = old.get((record["graph"], record["stage"]))
+		if before is None: continue
+		ratio = record["seconds"] / max(before["seconds"], 1e-9)
+		flag = " REGRESSION" if ratio > threshold else ""
+		print(f"{record['graph']:>18} {record['stage']:<28} {before['seconds']:9.3f} {record['seconds']:9.3f} {ratio:7.2f}{flag}")
+		if flag: regressions.append(record)
+	return regressions
+
+#*******************************************************************************
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Benchmark the offline and online phases on synthetic graphs")
+	parser.add_argument("--out", default="data/benchmark", help="report path without suffix")
+	parser.add_argument("--compare", default=None, help="older JSON report to check for regressions")
+	parser.add_argument("--threshold", type=float, default=THRESHOLD)
+	parser.add_argument("--sizes", type=int, nargs="*", default=None, help="graph sizes to use instead of the defaults")
+	parser.add_argument("--methods", nargs="*", default=METHODS)
+	parser.add_argument("--processes", type=int, default=None)
+	parser.add_argument("--seed", type=int, default=42)
+	args = parser.parse_args()
+
+	records = []
+	with tempfile.TemporaryDirectory() as workdir:
+		for kind, sizes in GRAPHS.items():
+			for size in args.sizes or sizes: run_graph(records, kind, size, workdir, args.methods, args.processes, args.seed)
+		check_directed(records, workdir, args.processes, args.seed)
+	os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+	write_report(records, args.out)
+	if args.compare and compare(records, args.compare, args.threshold): sys.exit(1)
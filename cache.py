@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import matrixstore as ms
+
+# Content addressed cache for landmark selections and landmark matrices.
+# Every entry lives in <cache_dir>/<key>/ where key is a hash of the graph fingerprint, the method,
+# the number of landmarks and the seed (and the matrix columns for matrices). <cache_dir>/index.json
+# keeps the metadata of all entries so a smaller landmark count can be served from a larger entry,
+# and the least recently used entries are evicted when the cache grows past its caps.
+INDEX_FILE = "index.json"
+MAX_BYTES = 20 * 2**30
+MAX_ENTRIES = 500
+VERSION = 2 # entries of another version are never matched (version 2: landmarks are vertex indices instead of names)
+
+#*******************************************************************************
+
+def cache_key(*parts):
+	return hashlib.sha1(json.dumps((VERSION,)+parts).encode()).hexdigest()
+
+#------------------------------------------------------------------------------#
+# Hash of the matrix columns (None means all nodes of the graph)
+def columns_digest(nodes):
+	if nodes is None: return "all"
+	return hashlib.sha1(json.dumps(np.asarray(nodes).tolist()).encode()).hexdigest()
+
+#------------------------------------------------------------------------------#
+def load_index(cache_dir):
+	if not os.path.exists(cache_dir+INDEX_FILE): return {}
+	with open(cache_dir+INDEX_FILE, 'r') as file:
+		return json.load(file)
+
+#------------------------------------------------------------------------------#
+def save_index(cache_dir, index):
+	os.makedirs(cache_dir, exist_ok=True)
+	with open(cache_dir+INDEX_FILE+".tmp", 'w') as file:
+		json.dump(index, file)
+	os.replace(cache_dir+INDEX_FILE+".tmp", cache_dir+INDEX_FILE) # never leave a half written index behind
+
+#------------------------------------------------------------------------------#
+def entry_dir(cache_dir, key):
+	return f"{cache_dir}{key}/"
+
+#------------------------------------------------------------------------------#
+def entry_bytes(path):
+	return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+#*******************************************************************************
+
+# Smallest entry of this kind that matches all fields and holds at least count landmarks, marks it as used
+def find_entry(cache_dir, kind, count, **fields):
+	index = load_index(cache_dir)
+	matches = [(entry["count"], key) for key, entry in index.items()
+			   if entry["kind"] == kind and entry.get("version") == VERSION and entry["count"] >= count and all(entry.get(k) == v for k, v in fields.items())
+			   and os.path.isdir(entry_dir(cache_dir, key))]
+	if not matches: return None
+	key = min(matches)[1]
+	index[key]["used"] = time.time()
+	save_index(cache_dir, index)
+	return key
+
+#------------------------------------------------------------------------------#
+# Add an entry whose files are in place to the index, then evict the least recently used entries over the caps
+def register_entry(cache_dir, key, kind, count, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES, **fields):
+	index = load_index(cache_dir)
+	index[key] = dict(fields, kind=kind, version=VERSION, count=count, bytes=entry_bytes(entry_dir(cache_dir, key)), used=time.time())
+	total = sum(entry["bytes"] for entry in index.values())
+	for old in sorted(index, key=lambda k: index[k]["used"]):
+		if (total <= max_bytes and len(index) <= max_entries) or old == key: continue
+		total -= index[old]["bytes"]
+		shutil.rmtree(entry_dir(cache_dir, old), ignore_errors=True)
+		del index[old]
+	save_index(cache_dir, index)
+
+#*******************************************************************************
+
+# Cached landmarks (and centrality scores, None for random) of a method, the first numLandmarks of a larger selection are used
+def load_selection(cache_dir, fingerprint, method, numLandmarks, seed):
+	key = find_entry(cache_dir, "selection", numLandmarks, fingerprint=fingerprint, method=method, seed=seed)
+	if key is None: return None
+	path = entry_dir(cache_dir, key)
+	with open(path+"landmarks.json", 'r') as file:
+		landmarks = json.load(file)[:numLandmarks]
+	scores = np.load(path+"scores.npy") if os.path.exists(path+"scores.npy") else None
+	return landmarks, scores
+
+#------------------------------------------------------------------------------#
+def store_selection(cache_dir, fingerprint, method, seed, landmarks, scores=None, **caps):
+	key = cache_key("selection", fingerprint, method, len(landmarks), seed)
+	path = entry_dir(cache_dir, key)
+	os.makedirs(path, exist_ok=True)
+	with open(path+"landmarks.json", 'w') as file:
+		json.dump(np.asarray(landmarks).tolist(), file)
+	if scores is not None: np.save(path+"scores.npy", np.asarray(scores, dtype=np.float64))
+	register_entry(cache_dir, key, "selection", len(landmarks), fingerprint=fingerprint, method=method, seed=seed, **caps)
+
+#*******************************************************************************
+
+# Path of a cached matrix whose first rows belong to these landmarks and whose columns are these nodes, None on a miss
+def lookup_matrix(cache_dir, fingerprint, method, seed, landmarks, nodes=None):
+	landmarks = np.asarray(landmarks).tolist()
+	key = find_entry(cache_dir, "matrix", len(landmarks), fingerprint=fingerprint, method=method, seed=seed, columns=columns_digest(nodes))
+	if key is None: return None
+	path = entry_dir(cache_dir, key)+"matrix"
+	if not ms.matrix_exists(path) or ms.read_header(path)["landmarks"][:len(landmarks)] != landmarks: return None
+	return path
+
+#------------------------------------------------------------------------------#
+# Path to build a new matrix at, call register_matrix once it is complete
+def matrix_path(cache_dir, fingerprint, method, seed, landmarks, nodes=None):
+	path = entry_dir(cache_dir, cache_key("matrix", fingerprint, method, len(landmarks), seed, columns_digest(nodes)))
+	os.makedirs(path, exist_ok=True)
+	return path+"matrix"
+
+#------------------------------------------------------------------------------#
+def register_matrix(cache_dir, fingerprint, method, seed, landmarks, nodes=None, **caps):
+	key = cache_key("matrix", fingerprint, method, len(landmarks), seed, columns_digest(nodes))
+	register_entry(cache_dir, key, "matrix", len(landmarks), fingerprint=fingerprint, method=method, seed=seed, columns=columns_digest(nodes), **caps)
@@ -0,0 +1,67 @@
+import time
+import numpy as np
+import engine # CSR adjacency and the searches on the process pool
+
+# Centrality scores for the landmark selection, computed on the CSR adjacency instead of per vertex in Python:
+#   top_k:     the k highest scores with one argpartition over all vertices and a sort of only those k
+#   pagerank:  power iteration, one sparse matrix-vector product (a bincount over the CSR entries) per step, until the
+#              L1 change of the ranks is below the tolerance, the iterations are used up or the time budget runs out
+#   closeness: estimated from the distances to a random sample of pivots (Eppstein-Wang), the mean distance of a
+#              vertex to the pivots stands for its mean distance to all vertices. The pivot searches run in batches
+#              of 64 on the process pool of engine.py and stop early when the time budget runs out
+DAMPING = 0.85
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 100
+PIVOTS = 256
+
+#*******************************************************************************
+
+# Vertex indices of the k highest scores, highest first and the lowest index first among equal scores (nan counts as
+# the lowest score), the same order as a stable sort on the score
+def top_k(scores, k):
+	scores = np.nan_to_num(np.asarray(scores, dtype=np.float64), nan=-np.inf)
+	k = min(int(k), len(scores))
+	if k <= 0: return np.empty(0, dtype=np.int64)
+	threshold = scores[np.argpartition(scores, len(scores)-k)[len(scores)-k]]
+	above = np.flatnonzero(scores > threshold)
+	top = np.concatenate([above, np.flatnonzero(scores == threshold)[:k-len(above)]])
+	return top[np.lexsort((top, -scores[top]))]
+
+#*******************************************************************************
+
+# PageRank of every vertex along the CSR entries (the out-edges of a directed graph), weighted by the weights if given
+# The rank of vertices without out-edges and the teleport share are spread evenly over all vertices
+def pagerank(indptr, indices, weights=None, damping=DAMPING, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS, budget=None):
+	n = len(indptr)-1
+	if n == 0: return np.zeros(0, dtype=np.float64)
+	source = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+	edge_weights = np.ones(len(indices), dtype=np.float64) if weights is None else np.asarray(weights, dtype=np.float64)
+	out = np.bincount(source, weights=edge_weights, minlength=n)
+	dangling = out == 0
+	share = edge_weights / np.where(dangling, 1, out)[source] # transition probability of every CSR entry
+	rank = np.full(n, 1/n)
+	start = time.time()
+	for _ in range(max_iterations):
+		new = damping * np.bincount(indices, weights=rank[source] * share, minlength=n)
+		new += (1 - new.sum()) / n # teleport and the rank of the dangling vertices
+		change = np.abs(new - rank).sum()
+		rank = new
+		if change < tolerance or (budget is not None and time.time() - start > budget): break
+	return rank
+
+#------------------------------------------------------------------------------#
+# Closeness (1 / mean distance) of every vertex estimated from the searches of pivots random pivots, a vertex that no
+# pivot reaches scores 0. The distances are those from the pivots, for a directed graph pass the reversed CSR (and
+# directed=True) so they are the distances from a vertex towards the pivots
+def closeness(indptr, indices, weights=None, pivots=PIVOTS, seed=None, processes=None, budget=None, directed=False):
+	n = len(indptr)-1
+	sources = np.random.default_rng(seed).permutation(n)[:pivots]
+	total, count = np.zeros(n, dtype=np.float64), np.zeros(n, dtype=np.int64)
+	start = time.time()
+	searches = engine.distance_sums(indptr, indices, sources, processes=processes, weights=weights, directed=directed)
+	for batch_total, batch_count in searches:
+		total += batch_total
+		count += batch_count
+		if budget is not None and time.time() - start > budget: break # at least one batch of pivots is used
+	searches.close()
+	return np.divide(count, total, out=np.zeros(n, dtype=np.float64), where=total > 0)
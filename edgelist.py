@@ -0,0 +1,99 @@
+import os
+from itertools import islice
+import numpy as np
+import engine # CSR construction
+
+# Loader for KONECT edge lists (out.* files): '%' header lines, two vertex IDs per line and optionally
+# extra weight/timestamp columns. The first header line "% <format> <weights>" tells whether the graph is directed
+# (format asym) and whether the third column holds edge weights (posweighted, multiposweighted), other weight types
+# (positive: unweighted multiple edges, signed, timestamps) are not distances and are ignored. The file is parsed in
+# chunks of lines with NumPy and the vertex IDs are remapped to 0..n-1 in order of first appearance (the numbering
+# ig.Graph.TupleList uses).
+# The result is cached next to the file in <path>.npz (edges, weights, ID map and CSR) so later runs skip the parsing.
+SIDECAR_SUFFIX = ".npz"
+CHUNK_LINES = 1_000_000
+DIRECTED_FORMATS = ("asym",)
+WEIGHTED_TYPES = ("posweighted", "multiposweighted")
+
+#*******************************************************************************
+
+# Whether the graph is directed and weighted, from the KONECT header line (undirected and unweighted without one)
+def read_format(path):
+	with open(path, 'r') as file:
+		words = file.readline().lstrip("%").split()
+	return len(words) > 0 and words[0] in DIRECTED_FORMATS, len(words) > 1 and words[1] in WEIGHTED_TYPES
+
+#------------------------------------------------------------------------------#
+# Edges of the file in chunks of up to chunk_lines lines, every chunk is an array of the original IDs with two columns
+# With weighted the chunks are float arrays with the weight as third column
+def edge_chunks(path, chunk_lines=CHUNK_LINES, weighted=False):
+	columns, dtype = ((0, 1, 2), np.float64) if weighted else ((0, 1), np.int64)
+	with open(path, 'r') as file:
+		while True:
+			lines = list(islice(file, chunk_lines))
+			if not lines: break
+			chunk = np.loadtxt(lines, comments="%", usecols=columns, dtype=dtype, ndmin=2)
+			if chunk.size: yield chunk
+
+#------------------------------------------------------------------------------#
+# Edges of the file as an m x 2 array of the original IDs, with weighted also the weight of every edge (else None)
+def parse_edges(path, chunk_lines=CHUNK_LINES, weighted=False):
+	chunks = list(edge_chunks(path, chunk_lines, weighted))
+	if not chunks: return np.empty((0, 2), dtype=np.int64), (np.empty(0) if weighted else None)
+	edges = np.concatenate(chunks)
+	if not weighted: return edges, None
+	return edges[:, :2].astype(np.int64), edges[:, 2]
+
+#------------------------------------------------------------------------------#
+# Replace the IDs by vertex indices, returns the edges and the ID of every vertex
+def remap_ids(edges):
+	ids, first, inverse = np.unique(edges.ravel(), return_index=True, return_inverse=True)
+	order = np.argsort(first) # vertex i is the i-th ID to appear in the file
+	rank = np.empty(len(ids), dtype=np.int64)
+	rank[order] = np.arange(len(ids))
+	return rank[inverse].reshape(-1, 2).astype(np.int32), ids[order]
+
+#*******************************************************************************
+
+def sidecar_path(path):
+	return path+SIDECAR_SUFFIX
+
+#------------------------------------------------------------------------------#
+# Size and modification time of the edge list, a sidecar is only used when they still match
+def source_stamp(path):
+	stat = os.stat(path)
+	return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+#------------------------------------------------------------------------------#
+def load_sidecar(path):
+	if not os.path.exists(sidecar_path(path)): return None
+	with np.load(sidecar_path(path)) as data:
+		if not np.array_equal(data["stamp"], source_stamp(path)) or "oriented" not in data: return None # changed, or written before the edges were oriented like igraph
+		sidecar = {name: data[name] for name in ("edges", "ids", "indptr", "indices")}
+		sidecar["directed"] = bool(data["directed"])
+		if bool(data["weighted"]) != read_format(path)[1]: return None # read with other weight types
+		sidecar["weights"] = data["weights"] if data["weights"].size == len(sidecar["edges"]) and bool(data["weighted"]) else None
+		return sidecar
+
+#------------------------------------------------------------------------------#
+def store_sidecar(path, edges, ids, indptr, indices, directed=False, weights=None):
+	tmp = path+".tmp"+SIDECAR_SUFFIX
+	np.savez(tmp, stamp=source_stamp(path), edges=edges, ids=ids, indptr=indptr, indices=indices, directed=directed, oriented=True,
+			 weighted=weights is not None, weights=np.empty(0) if weights is None else weights)
+	os.replace(tmp, sidecar_path(path)) # never leave a half written sidecar behind
+
+#*******************************************************************************
+
+# Parsed edge list: dict with the remapped edges (oriented as igraph stores them), their weights (None if unweighted),
+# whether they are directed, the original ID of every vertex and the CSR adjacency (along the edges for a directed graph)
+def load_edgelist(path, use_sidecar=True, chunk_lines=CHUNK_LINES):
+	if use_sidecar:
+		data = load_sidecar(path)
+		if data is not None: return data
+	directed, weighted = read_format(path)
+	edges, weights = parse_edges(path, chunk_lines, weighted)
+	edges, ids = remap_ids(edges)
+	if not directed: edges = np.sort(edges, axis=1) # igraph keeps an undirected edge with its lower vertex first
+	indptr, indices = engine.edges_to_csr(edges, len(ids), directed=directed)
+	if use_sidecar: store_sidecar(path, edges, ids, indptr, indices, directed, weights)
+	return {"edges": edges, "weights": weights, "directed": directed, "ids": ids, "indptr": indptr, "indices": indices}
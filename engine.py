@@ -0,0 +1,603 @@
+import heapq
+import os
+import threading
+import time
+import numpy as np
+from multiprocessing import get_context, shared_memory
+
+# BFS engine working on a CSR adjacency (indptr, indices) instead of an igraph object.
+# A batch of up to 64 sources is searched at the same time: every vertex keeps a uint64 word
+# with one bit per source, so one sweep over the edges advances all 64 searches by one level.
+# Weighted graphs are searched with another kernel, chosen from the weights (distance_kernel): BFS when all weights
+# are 1, Dial's bucketed Dijkstra for small positive integer weights and a binary-heap Dijkstra otherwise. A directed
+# graph is searched along its edges, the reverse CSR (edges_to_csr(..., reverse=True)) gives distances towards a vertex.
+BATCH_SIZE = 64
+PUSH_FRACTION = 0.05 # push from the frontier when it touches less than this fraction of the edges, else pull over all edges
+BLOCK_EDGES = 1 << 24 # edges per block when the CSR is memory mapped from disk (out-of-core), in memory it is one block
+DIAL_MAX_WEIGHT = 255 # largest integer weight that Dial's algorithm keeps a bucket for
+KERNEL_DTYPES = {"dial": np.uint32, "dijkstra": np.float32} # distances of the weighted kernels, BFS keeps the given dtype
+
+#*******************************************************************************
+
+# Parsed edge list arrays kept on an igraph graph by ifunctions.graph_from_arrays (edges, weights and the CSR along the
+# edges), None for a graph that was made otherwise or whose edges were changed (code that changes G drops G.arrays)
+def graph_arrays(G):
+	arrays = getattr(G, "arrays", None)
+	return arrays if arrays is not None and len(arrays["edges"]) == G.ecount() and len(arrays["ids"]) == G.vcount() else None
+
+#------------------------------------------------------------------------------#
+# Edges of an igraph graph as an m x 2 array, from the kept arrays without building a Python tuple per edge
+def graph_edges(G):
+	arrays = graph_arrays(G)
+	if arrays is not None: return arrays["edges"]
+	return np.asarray(G.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+
+#------------------------------------------------------------------------------#
+# Weight of every edge of an igraph graph as an array, None when G has no "weight" edge attribute
+def graph_weights(G):
+	arrays = graph_arrays(G)
+	if arrays is not None: return arrays["weights"]
+	return np.asarray(G.es["weight"], dtype=np.float64) if "weight" in G.es.attributes() else None
+
+#------------------------------------------------------------------------------#
+# Build the CSR adjacency of an igraph graph (both directions for undirected graphs), the CSR of the loaded edge list
+# is used as it is
+def graph_to_csr(G):
+	arrays = graph_arrays(G)
+	if arrays is not None: return arrays["indptr"], arrays["indices"]
+	return edges_to_csr(graph_edges(G), G.vcount(), directed=G.is_directed())
+
+#------------------------------------------------------------------------------#
+# CSR adjacency of an igraph graph with the weight of every CSR entry (None when G has no "weight" edge attribute),
+# with reverse the edges of a directed graph are turned around
+def graph_to_weighted_csr(G, reverse=False):
+	weights = graph_weights(G)
+	if weights is None and not (reverse and G.is_directed()): return (*graph_to_csr(G), None)
+	if weights is None: return (*edges_to_csr(graph_edges(G), G.vcount(), G.is_directed(), reverse=reverse), None)
+	return edges_to_csr(graph_edges(G), G.vcount(), G.is_directed(), weights=weights, reverse=reverse)
+
+#------------------------------------------------------------------------------#
+# Build the CSR adjacency of an m x 2 array of vertex indices on n vertices, with weights (one per edge) the weight of
+# every CSR entry is returned as a third array
+def edges_to_csr(edges, n, directed=False, weights=None, reverse=False):
+	edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+	if reverse: edges = edges[:, ::-1]
+	if weights is not None: weights = np.asarray(weights, dtype=np.float64).reshape(-1)
+	if not directed:
+		edges = np.concatenate([edges, edges[:, ::-1]])
+		if weights is not None: weights = np.concatenate([weights, weights])
+	order = np.argsort(edges[:, 0], kind="stable")
+	indices = edges[order, 1].astype(np.int32)
+	indptr = np.zeros(n+1, dtype=np.int64)
+	np.cumsum(np.bincount(edges[:, 0], minlength=n), out=indptr[1:])
+	if weights is None: return indptr, indices
+	return indptr, indices, weights[order]
+
+#------------------------------------------------------------------------------#
+# Positions in indices of the neighbour lists of the vertices in frontier, concatenated
+def edge_offsets(indptr, frontier):
+	starts = indptr[frontier]
+	lengths = indptr[frontier+1] - starts
+	return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+#------------------------------------------------------------------------------#
+# Concatenated neighbour lists of the vertices in frontier
+def neighbours(indptr, indices, frontier):
+	return indices[edge_offsets(indptr, frontier)]
+
+#------------------------------------------------------------------------------#
+# Vertex ranges [start, end) of the CSR with at most block_edges edges each (a vertex with more edges gets its own
+# range). A CSR in memory is one range, a memory mapped CSR is paged in one range at a time
+def vertex_blocks(indptr, block_edges=None):
+	n = len(indptr)-1
+	if block_edges is None: block_edges = BLOCK_EDGES if isinstance(indptr, np.memmap) else None
+	if block_edges is None or indptr[-1] <= block_edges: return [(0, n)]
+	bounds = [0]
+	while bounds[-1] < n:
+		end = int(np.searchsorted(indptr, indptr[bounds[-1]] + block_edges, side="right")) - 1
+		bounds.append(min(max(end, bounds[-1]+1), n))
+	return list(zip(bounds[:-1], bounds[1:]))
+
+#------------------------------------------------------------------------------#
+# Split vertices into groups whose neighbour lists have at most block_edges edges together
+def frontier_blocks(vertices, degree, block_edges):
+	if block_edges is None or len(vertices) == 0: return [vertices]
+	cut = np.searchsorted(np.cumsum(degree[vertices]), np.arange(block_edges, int(degree[vertices].sum()), block_edges), side="right")
+	return [group for group in np.split(vertices, np.unique(cut)) if group.size]
+
+#*******************************************************************************
+
+# Distances from one source to every vertex, vertices that are not reached keep the max value of dtype
+def bfs(indptr, indices, source, dtype=np.uint16):
+	unreachable = np.iinfo(dtype).max
+	dist = np.full(len(indptr)-1, unreachable, dtype=dtype)
+	dist[source] = 0
+	frontier = np.array([source], dtype=np.int64)
+	degree = np.diff(indptr)
+	block_edges = None if len(vertex_blocks(indptr)) == 1 else BLOCK_EDGES
+	level = 0
+	while frontier.size:
+		level += 1
+		if level >= unreachable: break # deeper vertices do not fit in dtype
+		new = []
+		for group in frontier_blocks(frontier, degree, block_edges):
+			found = neighbours(indptr, indices, group)
+			new.append(np.unique(found[dist[found] == unreachable]))
+			dist[new[-1]] = level
+		frontier = np.unique(np.concatenate(new))
+	return dist
+
+#------------------------------------------------------------------------------#
+# Distances from up to 64 sources at once, returns a len(sources) x vertices array
+# A directed CSR only lists the out-neighbours, so its frontier is always pushed (pulling needs the in-neighbours)
+def multi_source_bfs(indptr, indices, sources, dtype=np.uint16, directed=False):
+	n = len(indptr)-1
+	k = len(sources)
+	unreachable = np.iinfo(dtype).max
+	dist = np.full((k, n), unreachable, dtype=dtype)
+	dist[np.arange(k), sources] = 0
+	if len(indices) == 0: return dist
+
+	seen = np.zeros(n, dtype=np.uint64)
+	np.bitwise_or.at(seen, sources, np.left_shift(np.uint64(1), np.arange(k, dtype=np.uint64)))
+	frontier = seen.copy()
+	active = np.unique(sources)
+	degree = np.diff(indptr)
+	blocks = vertex_blocks(indptr) # the frontier bitmaps are per vertex, the edges are read one block at a time
+	block_edges = None if len(blocks) == 1 else BLOCK_EDGES
+	level = 0
+	while active.size:
+		level += 1
+		if level >= unreachable: break
+		reached = np.zeros(n, dtype=np.uint64)
+		if directed or degree[active].sum() < PUSH_FRACTION * len(indices): # small frontier: scatter its bits to the neighbours
+			for group in frontier_blocks(active, degree, block_edges):
+				np.bitwise_or.at(reached, neighbours(indptr, indices, group), np.repeat(frontier[group], degree[group]))
+		else: # large frontier: every vertex gathers the bits of its neighbours
+			for start, end in blocks:
+				first, last = indptr[start], indptr[end]
+				if first == last: continue
+				reached[start:end] = np.bitwise_or.reduceat(np.append(frontier[indices[first:last]], np.uint64(0)), indptr[start:end] - first) # padding keeps the offsets valid, empty rows are masked below
+			reached[degree == 0] = 0
+		frontier = reached & ~seen
+		active = np.flatnonzero(frontier)
+		seen[active] |= frontier[active]
+		# decode which sources reached each new vertex
+		words = frontier[active].astype("<u8").view(np.uint8).reshape(-1, 8)
+		vertex, source = np.nonzero(np.unpackbits(words, axis=1, bitorder="little")[:, :k])
+		dist[source, active[vertex]] = level
+	return dist
+
+#------------------------------------------------------------------------------#
+# Approximate betweenness from the shortest path trees of the given sources only (Brandes' dependency accumulation),
+# sampling stops early when time_budget seconds have passed. Scores are scaled up to the full vertex count
+def sampled_betweenness(indptr, indices, sources, time_budget=None):
+	n = len(indptr)-1
+	scores = np.zeros(n, dtype=np.float64)
+	start = time.time()
+	done = 0
+	for source in sources:
+		if time_budget is not None and done and time.time() - start > time_budget: break
+		dist = np.full(n, -1, dtype=np.int32)
+		sigma = np.zeros(n, dtype=np.float64) # number of shortest paths from the source
+		dist[source], sigma[source] = 0, 1
+		frontier, tree = np.array([source], dtype=np.int64), [] # per level the (parent, child) edges of the DAG
+		while frontier.size:
+			found = neighbours(indptr, indices, frontier)
+			parents = np.repeat(frontier, indptr[frontier+1] - indptr[frontier])
+			new = np.unique(found[dist[found] == -1])
+			dist[new] = len(tree) + 1
+			child = dist[found] == len(tree) + 1
+			parents, found = parents[child], found[child]
+			np.add.at(sigma, found, sigma[parents])
+			tree.append((parents, found))
+			frontier = new
+		delta = np.zeros(n, dtype=np.float64)
+		for parents, found in reversed(tree):
+			np.add.at(delta, parents, sigma[parents] / sigma[found] * (1 + delta[found]))
+		delta[source] = 0
+		scores += delta
+		done += 1
+	return scores * n / max(done, 1)
+
+#*******************************************************************************
+
+# Kernel for the weights of a CSR: "bfs" (no weights or all 1), "dial" (small positive integers) or "dijkstra"
+def distance_kernel(weights):
+	if weights is None or len(weights) == 0 or np.all(weights == 1): return "bfs"
+	if np.any(weights < 0): raise ValueError("Negative edge weights are not supported")
+	if np.all(weights >= 1) and np.all(weights == np.round(weights)) and weights.max() <= DIAL_MAX_WEIGHT: return "dial"
+	return "dijkstra"
+
+#------------------------------------------------------------------------------#
+# Storage type of the distances of a kernel, dtype is the one asked for unit weights
+def kernel_dtype(kernel, dtype=np.uint16):
+	return np.dtype(KERNEL_DTYPES.get(kernel, dtype))
+
+#------------------------------------------------------------------------------#
+# Value that marks an unreachable vertex in a distance array of dtype
+def unreachable_of(dtype):
+	return np.inf if np.dtype(dtype).kind == "f" else np.iinfo(dtype).max
+
+#------------------------------------------------------------------------------#
+# Float distances (inf if not reached) as dtype, values that do not fit become unreachable
+def encode_distances(dist, dtype):
+	unreachable = unreachable_of(dtype)
+	return np.where(dist < unreachable, dist, unreachable).astype(dtype)
+
+#------------------------------------------------------------------------------#
+# Distances from one source with Dial's algorithm: a bucket per distance modulo the largest weight + 1, every bucket
+# is settled as a whole and its edges are relaxed at once. Returns float distances, inf if not reached
+def dial(indptr, indices, weights, source):
+	dist = np.full(len(indptr)-1, np.inf)
+	dist[source] = 0
+	width = int(weights.max()) + 1 if len(weights) else 1
+	buckets = [[] for _ in range(width)]
+	buckets[0].append(np.array([source], dtype=np.int64))
+	pending, level = 1, 0
+	while pending:
+		slot = buckets[level % width]
+		if slot:
+			pending -= len(slot)
+			found = np.concatenate(slot)
+			slot.clear()
+			frontier = np.unique(found[dist[found] == level]) # entries that got a shorter distance later are stale
+			offsets = edge_offsets(indptr, frontier)
+			reached, candidate = indices[offsets].astype(np.int64), level + weights[offsets]
+			better = candidate < dist[reached]
+			reached, candidate = reached[better], candidate[better]
+			np.minimum.at(dist, reached, candidate)
+			best = dist[reached] == candidate
+			reached, candidate = reached[best], candidate[best]
+			for value in np.unique(candidate):
+				buckets[int(value) % width].append(reached[candidate == value])
+				pending += 1
+		level += 1
+	return dist
+
+#------------------------------------------------------------------------------#
+# Distances from one source with a binary-heap Dijkstra, returns float distances, inf if not reached
+def dijkstra(indptr, indices, weights, source):
+	dist = np.full(len(indptr)-1, np.inf)
+	dist[source] = 0
+	done = np.zeros(len(dist), dtype=bool)
+	heap = [(0.0, int(source))]
+	while heap:
+		level, vertex = heapq.heappop(heap)
+		if done[vertex]: continue
+		done[vertex] = True
+		start, end = indptr[vertex], indptr[vertex+1]
+		candidate = level + weights[start:end]
+		better = candidate < dist[indices[start:end]]
+		for x, d in zip(indices[start:end][better].tolist(), candidate[better].tolist()):
+			if d < dist[x]:
+				dist[x] = d
+				heapq.heappush(heap, (d, x))
+	return dist
+
+#------------------------------------------------------------------------------#
+# Distances from every source with the kernel of the weights, returns a len(sources) x vertices array of dtype
+def source_distances(indptr, indices, sources, dtype=np.uint16, weights=None, kernel=None, directed=False):
+	if kernel is None: kernel = distance_kernel(weights)
+	if kernel == "bfs": return multi_source_bfs(indptr, indices, sources, dtype, directed)
+	search = dial if kernel == "dial" else dijkstra
+	rows = np.empty((len(sources), len(indptr)-1), dtype=dtype)
+	for row, source in zip(rows, sources): row[:] = encode_distances(search(indptr, indices, weights, source), dtype)
+	return rows
+
+#*******************************************************************************
+
+# Highest scores first, but skip the neighbours of landmarks that are already chosen (degree-partitioned)
+# When the budget (seconds) runs out the remaining landmarks are the highest scores not chosen yet
+def degree_partitioned(indptr, indices, scores, num_landmarks, budget=None):
+	order = np.argsort(-np.asarray(scores), kind="stable")
+	blocked = np.zeros(len(indptr)-1, dtype=bool)
+	landmarks = []
+	start = time.time()
+	for vertex in order:
+		if len(landmarks) == num_landmarks or (budget is not None and time.time() - start > budget): break
+		if blocked[vertex]: continue
+		landmarks.append(int(vertex))
+		blocked[vertex] = True
+		blocked[indices[indptr[vertex]:indptr[vertex+1]]] = True
+	chosen = set(landmarks)
+	landmarks += [int(v) for v in order[:num_landmarks+len(chosen)] if v not in chosen][:num_landmarks-len(landmarks)] # budget ran out or too few vertices left
+	return landmarks
+
+#------------------------------------------------------------------------------#
+# Greedily the vertex farthest from the landmarks chosen so far (coverage), starting from the highest degree vertex
+# The BFS row of every landmark is appended to rows (if given) so the landmark matrix does not search them again
+# When the budget (seconds) runs out the remaining landmarks are the highest degree vertices not chosen yet
+# With weights the distances come from the weighted kernel and the rows have its dtype (kernel_dtype)
+def farthest_points(indptr, indices, num_landmarks, budget=None, rows=None, dtype=np.uint16, weights=None):
+	n = len(indptr)-1
+	degree = np.diff(indptr)
+	kernel = distance_kernel(weights)
+	dtype = kernel_dtype(kernel, dtype)
+	unreachable = unreachable_of(dtype)
+	nearest = np.full(n, np.inf) # distance to the closest landmark
+	landmarks = []
+	start = time.time()
+	vertex = int(np.argmax(degree))
+	while len(landmarks) < min(num_landmarks, n) and (budget is None or time.time() - start <= budget):
+		dist = bfs(indptr, indices, vertex, dtype=dtype) if kernel == "bfs" else source_distances(indptr, indices, [vertex], dtype, weights, kernel)[0]
+		if rows is not None: rows.append(dist)
+		landmarks.append(vertex)
+		np.minimum(nearest, np.where(dist == unreachable, nearest, dist), out=nearest)
+		nearest[vertex] = -1
+		vertex = int(np.argmax(nearest)) # ties go to the lowest index
+	chosen = set(landmarks)
+	order = np.argsort(-degree, kind="stable")
+	landmarks += [int(v) for v in order[:num_landmarks+len(chosen)] if v not in chosen][:num_landmarks-len(landmarks)]
+	return landmarks
+
+#------------------------------------------------------------------------------#
+# Parent of every vertex in a BFS tree given the distances from its root (the neighbour one level closer to the
+# root with the highest index), -1 for the root and for vertices that are not reached
+# With weights it is the shortest path tree: the neighbour whose distance plus the edge weight gives the distance
+def tree_parents(indptr, indices, dist, weights=None):
+	n = len(dist)
+	degree = np.diff(indptr)
+	unreachable = unreachable_of(dist.dtype)
+	level = dist.astype(np.int64 if weights is None else np.float64)
+	parents = np.full(n, -1, dtype=np.int32)
+	for start, end in vertex_blocks(indptr):
+		first, last = indptr[start], indptr[end]
+		if first == last: continue
+		neighbour = np.asarray(indices[first:last])
+		owner = np.repeat(np.arange(start, end), degree[start:end])
+		if weights is None: closer = (level[neighbour] == level[owner] - 1) & (level[owner] != unreachable)
+		else: closer = np.isclose(level[neighbour] + weights[first:last], level[owner], rtol=1e-6, atol=0) & (level[owner] != unreachable) & (neighbour != owner)
+		candidate = np.where(closer, neighbour, -1).astype(np.int32)
+		rows = degree[start:end] > 0
+		parents[start:end][rows] = np.maximum.reduceat(candidate, indptr[start:end][rows] - first) # empty rows are left out, so the slices stay exact
+	return parents
+
+#*******************************************************************************
+
+# Copy the CSR arrays (and the weights) into shared memory so every worker reads the same copy, a CSR memory mapped
+# from .npy files is not copied: the workers map the same files
+def share_csr(*arrays):
+	blocks, spec = [], []
+	for array in arrays:
+		if isinstance(array, np.memmap) and array.filename is not None:
+			spec.append((None, array.filename, None))
+			continue
+		block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+		np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+		blocks.append(block)
+		spec.append((block.name, array.shape, array.dtype.str))
+	return blocks, spec
+
+#------------------------------------------------------------------------------#
+def release_shared(blocks):
+	for block in blocks:
+		block.close()
+		block.unlink()
+
+#------------------------------------------------------------------------------#
+# State of a pool worker: shared CSR (with the weights for a weighted kernel), dtype, kernel, direction, the output jobs
+# and the opened output matrices. It is kept per thread, so two stages that run in threads of one process at the same
+# time (runner.py) each keep their own state when they work in-process
+_local = threading.local()
+
+def _worker():
+	if not hasattr(_local, "state"): _local.state = {}
+	return _local.state
+
+def _init_worker(spec, dtype, jobs, kernel, directed):
+	worker = _worker()
+	worker["blocks"] = [shared_memory.SharedMemory(name=name) for name, _, _ in spec if name is not None]
+	blocks = iter(worker["blocks"])
+	worker["csr"] = [np.load(shape, mmap_mode="r") if name is None else np.ndarray(shape, dtype=np.dtype(dt), buffer=next(blocks).buf)
+					  for name, shape, dt in spec]
+	worker.update(dtype=dtype, jobs=jobs, matrices={}, kernel=kernel, directed=directed)
+
+#------------------------------------------------------------------------------#
+# Run task on every batch, in this process or spread over a pool that shares one copy of the CSR
+# weights are only shared for a weighted kernel, with unit weights the tasks run the bit-parallel BFS
+def _map(task, batches, indptr, indices, dtype, processes=None, jobs=None, weights=None, directed=False):
+	kernel = distance_kernel(weights)
+	csr = [indptr, indices] if kernel == "bfs" else [indptr, indices, weights]
+	processes = min(processes or os.cpu_count(), len(batches))
+	if processes <= 1: # no pool needed, work on the arrays directly
+		_worker().update(csr=csr, dtype=dtype, jobs=jobs, matrices={}, kernel=kernel, directed=directed)
+		try:
+			for batch in batches: yield task(batch)
+		finally: _worker().clear()
+		return
+	blocks, spec = share_csr(*csr)
+	context = get_context("spawn" if threading.active_count() > 1 else None) # forking while other threads run can copy their held locks
+	try:
+		with context.Pool(processes, initializer=_init_worker, initargs=(spec, dtype, jobs, kernel, directed)) as pool:
+			yield from pool.imap_unordered(task, batches)
+	finally:
+		release_shared(blocks)
+
+#------------------------------------------------------------------------------#
+# Distances from a batch of sources in a task, with the kernel of the shared weights
+def _search(sources):
+	worker = _worker()
+	indptr, indices, *weights = worker["csr"]
+	return source_distances(indptr, indices, np.asarray(sources), worker["dtype"], weights[0] if weights else None, worker["kernel"], worker["directed"])
+
+#*******************************************************************************
+
+# Search a batch of sources and write every row into the output matrices that use that source
+def _landmark_rows_task(batch):
+	worker = _worker()
+	indptr, indices, *weights = worker["csr"]
+	matrices = worker["matrices"]
+	sources, targets = batch
+	dist = _search(sources)
+	for row, source_targets in zip(dist, targets):
+		parents = None
+		for job, position in source_targets:
+			path, columns, parents_path = worker["jobs"][job]
+			for out in (path, parents_path):
+				if out is not None and out not in matrices: matrices[out] = np.load(out, mmap_mode="r+")
+			matrices[path][position] = row if columns is None else row[columns]
+			if parents_path is not None:
+				if parents is None: parents = tree_parents(indptr, indices, row, weights[0] if weights else None)
+				matrices[parents_path][position] = parents
+	for matrix in matrices.values(): matrix.flush()
+	return sources
+
+#------------------------------------------------------------------------------#
+# Fill landmark matrices (.npy files) in parallel. jobs is a list of (npy path, landmark vertex indices,
+# column vertex indices or None for all vertices[, npy path for the BFS tree parents of every vertex]).
+# A landmark used by several jobs is searched only once,
+# landmarks given as -1 are skipped (their rows are already filled in). on_rows is called with the (job, row) pairs
+# of every finished batch once those rows are flushed to disk. With weights dtype should be kernel_dtype of their kernel.
+# directed tells that the CSR holds the edges of a directed graph (see multi_source_bfs)
+def fill_landmark_rows(indptr, indices, jobs, dtype=np.uint16, processes=None, progress=None, on_rows=None, weights=None, directed=False):
+	targets = {} # source -> [(job, row)]
+	for job, (_, landmarks, *_) in enumerate(jobs):
+		for position, source in enumerate(landmarks):
+			if source >= 0: targets.setdefault(int(source), []).append((job, position))
+	sources = sorted(targets)
+	batches = [(sources[i:i+BATCH_SIZE], [targets[s] for s in sources[i:i+BATCH_SIZE]]) for i in range(0, len(sources), BATCH_SIZE)]
+	outputs = [(path, None if columns is None else np.asarray(columns), rest[0] if rest else None) for path, _, columns, *rest in jobs]
+	done = 0
+	for finished in _map(_landmark_rows_task, batches, indptr, indices, dtype, processes, jobs=outputs, weights=weights, directed=directed):
+		done += len(finished)
+		if on_rows: on_rows([row for source in finished for row in targets[source]])
+		if progress: progress(done, len(sources))
+	return len(sources)
+
+#*******************************************************************************
+
+# Histogram of the distances from every source of a batch, returns a len(sources) x (max distance + 1) count array
+# (weighted distances are binned by their integer part)
+def _distance_histogram_task(sources):
+	unreachable = unreachable_of(_worker()["dtype"])
+	dist = _search(sources)
+	reached = dist != unreachable
+	width = int(dist[reached].max()) + 1
+	flat = dist.astype(np.int64) + np.arange(len(sources))[:, None] * width # one block of bins per source, float distances fall in the bin of their integer part
+	return np.bincount(flat[reached], minlength=len(sources)*width).reshape(len(sources), width)
+
+#------------------------------------------------------------------------------#
+# Distance histograms of the sources, yielded per batch of up to 64 sources as they finish (in any order)
+def distance_histograms(indptr, indices, sources, dtype=np.uint16, processes=None, weights=None, directed=False):
+	batches = [sources[i:i+BATCH_SIZE] for i in range(0, len(sources), BATCH_SIZE)]
+	yield from _map(_distance_histogram_task, batches, indptr, indices, kernel_dtype(distance_kernel(weights), dtype), processes, weights=weights, directed=directed)
+
+#------------------------------------------------------------------------------#
+# Per vertex the summed distance from a batch of sources and the number of those sources that reach it (the source
+# itself not counted), for the closeness estimate of centrality.py
+def _distance_sums_task(sources):
+	unreachable = unreachable_of(_worker()["dtype"])
+	dist = _search(sources)
+	reached = (dist != unreachable) & (dist > 0)
+	return np.where(reached, dist, 0).sum(axis=0, dtype=np.float64), reached.sum(axis=0)
+
+#------------------------------------------------------------------------------#
+# Distance sums and counts of the sources, yielded per batch of up to 64 sources as they finish (in any order)
+def distance_sums(indptr, indices, sources, dtype=np.uint16, processes=None, weights=None, directed=False):
+	batches = [sources[i:i+BATCH_SIZE] for i in range(0, len(sources), BATCH_SIZE)]
+	yield from _map(_distance_sums_task, batches, indptr, indices, kernel_dtype(distance_kernel(weights), dtype), processes, weights=weights, directed=directed)
+
+#*******************************************************************************
+
+# Exact distance between two vertices, the smaller frontier is expanded one level at a time until the searches meet
+# Returns the distance (inf if not connected) and the number of vertices visited
+# With lower_bound(side, vertices) (lower bounds on the distance to the target for side 0, to the source for side 1)
+# and an upper bound on the distance, vertices that cannot lie on a path of at most upper edges are pruned (ALT style).
+# Vertices on a shortest path are never pruned, so the result stays exact
+def bidirectional_bfs(indptr, indices, source, target, lower_bound=None, upper=float('inf')):
+	if source == target: return 0, 1
+	n = len(indptr)-1
+	dist = [np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)] # -1 not seen, -2 pruned
+	dist[0][source], dist[1][target] = 0, 0
+	frontier = [np.array([source], dtype=np.int64), np.array([target], dtype=np.int64)]
+	level = [0, 0]
+	visited = 2
+	while frontier[0].size and frontier[1].size:
+		volume = [(indptr[f+1] - indptr[f]).sum() for f in frontier]
+		side = 0 if volume[0] <= volume[1] else 1
+		found = neighbours(indptr, indices, frontier[side])
+		found = np.unique(found[dist[side][found] == -1])
+		level[side] += 1
+		if lower_bound is not None and upper < float('inf'):
+			keep = level[side] + lower_bound(side, found) <= upper
+			dist[side][found[~keep]] = -2
+			found = found[keep]
+		dist[side][found] = level[side]
+		frontier[side] = found
+		visited += found.size
+		meet = dist[1-side][found]
+		meet = meet[meet >= 0]
+		if meet.size: return level[side] + int(meet.min()), visited # every shorter path would have met in an earlier level
+	return float('inf'), visited
+
+#------------------------------------------------------------------------------#
+# Landmark lower bound max|d(l,v)-d(l,endpoint)| for every vertex, inf when a landmark shows they are not connected.
+# rows is a landmarks x columns distance matrix, column_of maps a vertex to its column (-1 if it has none, bound 0)
+def landmark_lower_bounds(rows, column_of, vertices, endpoint, unreachable):
+	bound = np.zeros(len(vertices), dtype=np.float64)
+	if column_of[endpoint] < 0 or len(vertices) == 0: return bound
+	columns = column_of[vertices]
+	known = np.flatnonzero(columns >= 0)
+	dist_v = rows[:, columns[known]].astype(np.int32)
+	dist_e = rows[:, column_of[endpoint]].astype(np.int32)[:, None]
+	reach_v, reach_e = dist_v != unreachable, dist_e != unreachable
+	diff = np.where(reach_v & reach_e, np.abs(dist_v - dist_e), 0)
+	bound[known] = diff.max(axis=0) if len(rows) else 0
+	bound[known[(reach_v != reach_e).any(axis=0)]] = np.inf
+	return bound
+
+#------------------------------------------------------------------------------#
+# Distances for a task of pairs: ("bfs", sources, [pair ids per source], [targets per source]) or ("pairs", pair ids, sources, targets)
+def _pair_distances_task(task):
+	indptr, indices, *_ = _worker()["csr"]
+	dtype = _worker()["dtype"]
+	kind, *data = task
+	if kind == "bfs":
+		sources, pair_ids, targets = data
+		dist = _search(sources)
+		return np.concatenate(pair_ids), np.concatenate([row[t] for row, t in zip(dist, targets)])
+	pair_ids, sources, targets = data
+	unreachable = np.iinfo(dtype).max
+	dist = np.empty(len(pair_ids), dtype=dtype)
+	for i, (s, t) in enumerate(zip(sources, targets)):
+		d, _ = bidirectional_bfs(indptr, indices, s, t)
+		dist[i] = min(d, unreachable)
+	return pair_ids, dist
+
+#------------------------------------------------------------------------------#
+# Exact distances for an array of (source, target) vertex pairs, in the order of the pairs
+# Every pair is answered from the endpoint it shares with most other pairs: one BFS per distinct source
+# answers all its targets, pairs that share no endpoint use a bidirectional BFS
+# A directed graph (CSR along the edges) is always searched from the first vertex of a pair, with weights every pair
+# is answered by a search of the weighted kernel from its source. The result has kernel_dtype of the weights
+def pair_distances(indptr, indices, pairs, dtype=np.uint16, processes=None, progress=None, chunk_size=256, weights=None, directed=False):
+	kernel = distance_kernel(weights)
+	dtype = kernel_dtype(kernel, dtype)
+	pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+	counts = np.bincount(pairs.ravel(), minlength=len(indptr)-1)
+	flip = (counts[pairs[:, 1]] > counts[pairs[:, 0]]) & (not directed)
+	sources = np.where(flip, pairs[:, 1], pairs[:, 0])
+	targets = np.where(flip, pairs[:, 0], pairs[:, 1])
+	bidirectional = kernel == "bfs" and not directed # the bidirectional BFS needs unit weights and symmetric edges
+
+	order = np.argsort(sources, kind="stable")
+	groups, starts, sizes = np.unique(sources[order], return_index=True, return_counts=True)
+	tasks = []
+	shared = np.flatnonzero(sizes > 1) if bidirectional else np.arange(len(groups))
+	for i in range(0, len(shared), BATCH_SIZE):
+		group = shared[i:i+BATCH_SIZE]
+		ids = [order[starts[g]:starts[g]+sizes[g]] for g in group]
+		tasks.append(("bfs", groups[group], ids, [targets[pair] for pair in ids]))
+	single = order[starts[sizes == 1]] if bidirectional else np.empty(0, dtype=np.int64)
+	for i in range(0, len(single), chunk_size):
+		ids = single[i:i+chunk_size]
+		tasks.append(("pairs", ids, sources[ids], targets[ids]))
+
+	dist = np.empty(len(pairs), dtype=dtype)
+	done = 0
+	for pair_ids, values in _map(_pair_distances_task, tasks, indptr, indices, dtype, processes, weights=weights, directed=directed):
+		dist[pair_ids] = values
+		done += len(pair_ids)
+		if progress: progress(done, len(pairs))
+	return dist
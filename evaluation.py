@@ -0,0 +1,99 @@
+import csv
+import json
+import time
+import warnings
+import numpy as np
+
+# Accuracy against cost of the landmark estimates. The estimates of all landmark counts (landmark counts x pairs, as
+# CalcEstimateDistRange returns them) are compared with the real distances pair by pair in one vectorized pass:
+#   the relative error (approx - real) / real of every pair, its mean, the error percentiles and the exact-hit rate,
+#   overall and per bucket of the real distance (1, 2, ..., MAX_BUCKET or more)
+# A pair without an estimate (no landmark reaches both nodes) is a miss and is left out of the error statistics.
+# The cost of a configuration is the measured time per query and the memory of the landmark rows a query reads.
+PERCENTILES = [50, 90, 99]
+MAX_BUCKET = 8
+QUERY_PAIRS = 2000 # pairs timed per landmark count
+REPEATS = 3 # the fastest of the repeats is kept
+FIELDS = ["method", "landmarks", "bucket", "pairs", "mean_error", "exact_share", "miss_share"] + \
+		 [f"p{p}_error" for p in PERCENTILES] + ["query_us", "memory_mb"]
+
+#*******************************************************************************
+
+# Error statistics per landmark count over the pairs in mask, errors and estimated are landmark counts x pairs
+def error_statistics(errors, estimated, mask):
+	errors, estimated = errors[:, mask], estimated[:, mask]
+	count = errors.shape[1]
+	if count == 0: return {"pairs": np.zeros(len(errors), dtype=np.int64)}
+	defined = np.where(estimated, errors, np.nan)
+	with warnings.catch_warnings(): # a landmark count without any estimate gives nan, not a warning
+		warnings.simplefilter("ignore", RuntimeWarning)
+		mean = np.nanmean(defined, axis=1)
+		percentiles = np.nanpercentile(defined, PERCENTILES, axis=1)
+	stats = {"pairs": np.full(len(errors), count),
+			 "mean_error": mean,
+			 "exact_share": (estimated & (errors == 0)).mean(axis=1),
+			 "miss_share": (~estimated).mean(axis=1)}
+	stats.update({f"p{p}_error": percentiles[idx] for idx, p in enumerate(PERCENTILES)})
+	return stats
+
+#------------------------------------------------------------------------------#
+# Records (one per landmark count and distance bucket, bucket "all" for all pairs) of the estimates of one method
+# estimates maps a landmark count to the estimates of the pairs, real holds the real distances (inf if not connected)
+def evaluate(method, estimates, real_distances, landmark_range, costs=None):
+	real = np.asarray(real_distances, dtype=np.float64)
+	valid = np.isfinite(real) & (real > 0)
+	approx = np.stack([np.asarray(estimates[numLandmarks], dtype=np.float64) for numLandmarks in landmark_range])
+	estimated = np.isfinite(approx)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		errors = (approx - real) / real
+
+	buckets = np.minimum(np.where(valid, real, 0), MAX_BUCKET).astype(np.int64)
+	groups = [("all", valid)] + [(f"{b}+" if b == MAX_BUCKET else str(b), valid & (buckets == b)) for b in range(1, MAX_BUCKET+1)]
+	records = []
+	for bucket, mask in groups:
+		stats = error_statistics(errors, estimated, mask)
+		for idx, numLandmarks in enumerate(landmark_range):
+			record = {"method": method, "landmarks": numLandmarks, "bucket": bucket}
+			record.update({name: float(values[idx]) if name != "pairs" else int(values[idx]) for name, values in stats.items()})
+			if costs is not None and bucket == "all": record.update(costs[numLandmarks])
+			records.append(record)
+	return records
+
+#*******************************************************************************
+
+# Measured query time (microseconds per pair) and memory (MB of the landmark rows read) of every landmark count
+# estimate is CalcEstimateDist(matrix, node_index, pairs, numLandmarks), passed in to keep this module free of igraph
+def query_costs(estimate, matrix, node_index, pairs, landmark_range):
+	sample = pairs[:QUERY_PAIRS]
+	costs = {}
+	for numLandmarks in landmark_range:
+		seconds = np.inf
+		for _ in range(REPEATS):
+			tik = time.perf_counter()
+			estimate(matrix, node_index, sample, numLandmarks)
+			seconds = min(seconds, time.perf_counter() - tik)
+		rows = min(numLandmarks, matrix.shape[0])
+		costs[numLandmarks] = {"query_us": seconds / max(len(sample), 1) * 1e6,
+							   "memory_mb": rows * matrix.shape[1] * matrix.dtype.itemsize / 2**20}
+	return costs
+
+#------------------------------------------------------------------------------#
+# Indices of the points (cost, error) that no other point beats in both, in order of cost
+def pareto_front(costs, errors):
+	order = np.lexsort((np.asarray(errors), np.asarray(costs)))
+	front, best = [], np.inf
+	for idx in order:
+		if errors[idx] < best:
+			front.append(int(idx))
+			best = errors[idx]
+	return front
+
+#------------------------------------------------------------------------------#
+def write_evaluation(records, path):
+	with open(path+"_evaluation.json", 'w') as file:
+		json.dump(records, file, indent=1)
+	with open(path+"_evaluation.csv", 'w', newline="") as file:
+		writer = csv.DictWriter(file, fieldnames=FIELDS)
+		writer.writeheader()
+		writer.writerows(records)
+	print(f"Evaluation is stored as {path}_evaluation.json and {path}_evaluation.csv")
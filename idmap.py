@@ -0,0 +1,39 @@
+import numpy as np
+
+# Vertex identity in the pipeline: internally a vertex is its igraph index (0..n-1, stored as INDEX_DTYPE), external
+# IDs (the names from the edge list) are only used where data enters or leaves: the edge list, matrix headers, and the
+# query front ends. An IdMap translates between the two in both directions with arrays only: the IDs in index order
+# for index -> ID, and the IDs sorted with their indices for a binary search ID -> index.
+INDEX_DTYPE = np.int32
+
+#*******************************************************************************
+
+class IdMap:
+	def __init__(self, ids):
+		self.ids = np.asarray(ids)
+		self.order = np.argsort(self.ids, kind="stable").astype(INDEX_DTYPE)
+		self.sorted = self.ids[self.order]
+
+	def __len__(self):
+		return len(self.ids)
+
+	#------------------------------------------------------------------------------#
+	# Index of every ID, raises KeyError for an ID that is not in the map
+	def to_index(self, ids):
+		ids = np.asarray(ids)
+		if ids.size == 0: return np.empty(ids.shape, dtype=INDEX_DTYPE)
+		if len(self.ids) == 0: raise KeyError(ids.flat[0])
+		position = np.minimum(np.searchsorted(self.sorted, ids), len(self.sorted)-1)
+		found = self.sorted[position] == ids
+		if not np.all(found): raise KeyError(ids[~found].flat[0])
+		return self.order[position]
+
+	#------------------------------------------------------------------------------#
+	def to_id(self, indices):
+		return self.ids[np.asarray(indices, dtype=np.int64)]
+
+	#------------------------------------------------------------------------------#
+	def __contains__(self, id_):
+		if len(self.ids) == 0: return False
+		position = min(int(np.searchsorted(self.sorted, id_)), len(self.sorted)-1)
+		return bool(self.sorted[position] == id_)
@@ -4,17 +4,26 @@ import re
 import random
 import json
 import matplotlib.pyplot as plt
-from operator import itemgetter
 import pickle
 import networkx as nx
+import hashlib
+import matrixstore as ms # binary landmark matrix store
+import engine # CSR based (multi-source) BFS
+import centrality # top-k, PageRank and pivot closeness on the CSR
+import edgelist as el # fast KONECT edge list loader
+import idmap # internal vertex indices <-> external IDs
+import evaluation as ev # accuracy against cost
 
 random.seed(42)
 import igraph as ig
 
+SAMPLES = 256 # BFS trees used for sampled betweenness
+
 #*******************************************************************************
 
 # Custom made progressbar to keep track of the progress
 def custom_progress_bar(current_step, total_steps, task=""):
+	if current_step != total_steps and int(100*current_step/total_steps) == int(100*(current_step-1)/total_steps): return # only redraw when the percentage changes
 	if task != "": task+=" "
 	percent_complete = (current_step / total_steps) * 100
 	progress = "[" + "#" * int(percent_complete) + "-" * (100 - int(percent_complete)) + "]"
@@ -35,141 +44,396 @@ def create_smallworld_graph(size):
 
 #*******************************************************************************
 
-# Extract largest connected component if needed
+# Extract largest connected component if needed (strongly connected for a directed graph, so every pair has a distance)
+# A connected graph is returned as it is. The component of a graph with edge list arrays is cut out of the arrays, with
+# the vertices and edges in the order igraph's subgraph gives them, so it keeps arrays and a CSR as well
 def largest_cc(G):
-	components = G.components()
-	giant_component_index = components.sizes().index(max(components.sizes()))
-	return  components.subgraph(giant_component_index)
+	components = G.components(mode="strong")
+	sizes = components.sizes()
+	giant_component_index = sizes.index(max(sizes))
+	if sizes[giant_component_index] == G.vcount(): return G
+	arrays = engine.graph_arrays(G)
+	if arrays is None: return components.subgraph(giant_component_index)
+	keep = np.asarray(components.membership) == giant_component_index
+	inside = keep[arrays["edges"][:, 0]] & keep[arrays["edges"][:, 1]]
+	edges = (np.cumsum(keep) - 1)[arrays["edges"][inside]].astype(np.int32)
+	data = {"edges": edges, "weights": None if arrays["weights"] is None else arrays["weights"][inside],
+			"directed": arrays["directed"], "ids": arrays["ids"][keep]}
+	data["indptr"], data["indices"] = engine.edges_to_csr(edges, len(data["ids"]), directed=data["directed"])
+	return graph_from_arrays(data)
+
+#*******************************************************************************
+
+# Hash of the vertex names and the edge list, used to check that stored data belongs to this graph
+# (the direction and the weights count as well, an undirected unweighted graph keeps the hash it always had)
+def graph_fingerprint(G):
+	digest = hashlib.sha1()
+	if G.vs.attributes(): digest.update(json.dumps(list(G.vs[G.vs.attributes()[0]])).encode())
+	digest.update(np.asarray(engine.graph_edges(G), dtype=np.int64).tobytes())
+	if G.is_directed(): digest.update(b"directed")
+	if edge_weights(G): digest.update(engine.graph_weights(G).tobytes())
+	return digest.hexdigest()
+
+#------------------------------------------------------------------------------#
+# Edge weights of G as igraph argument (the attribute name), None when G is unweighted
+def edge_weights(G):
+	return "weight" if "weight" in G.es.attributes() else None
+
+#------------------------------------------------------------------------------#
+# Direction in which the distances from a vertex run: along the edges of a directed graph
+def distance_mode(G):
+	return "out" if G.is_directed() else "all"
 
 #*******************************************************************************
 
-# Read data to graph
-def read_graph_file(path):
-	with open(path, 'r') as file:
-		edgelist = [line.strip().split() for line in file]
-	G = ig.Graph.TupleList(edgelist, directed=False, weights=None)
+# Read data to graph, the parsed edge list is cached in a sidecar next to the file (see edgelist.py)
+def read_graph_file(path, use_sidecar=True):
+	return graph_from_arrays(el.load_edgelist(path, use_sidecar=use_sidecar))
+
+#------------------------------------------------------------------------------#
+# Graph of parsed edge list arrays (el.load_edgelist), the arrays are kept as G.arrays so the CSR and the edge array
+# are reused by engine.graph_to_csr instead of being built again from G.get_edgelist()
+def graph_from_arrays(data):
+	G = ig.Graph(n=len(data["ids"]), edges=data["edges"], directed=data["directed"])
+	G.vs["name"] = data["ids"].astype(str).tolist() # same vertex names as ig.Graph.TupleList gave
+	if data["weights"] is not None: G.es["weight"] = data["weights"].tolist()
+	G.arrays = data
 	return G
 
 #*******************************************************************************
 
+# Every selection method returns vertex indices, external IDs are only looked up at the boundaries (see idmap.py)
+
+# The top of a ranking is taken with centrality.top_k, ties go to the lowest vertex index
+
 # Choose landmarks with Degree
-def degree_landmarks(G, num_landmarks):
-	att = G.vs.attributes()[0]
-	sort_degree = sorted([(G.vs[i][att], G.vs[i].degree()) for i in range(len(G.vs))], key=lambda x: x[1], reverse=True)
-	Landmarks = sorted(list(map(itemgetter(0), list(sort_degree[:num_landmarks]))), reverse=False)
-	return Landmarks
+def degree_landmarks(G, num_landmarks, scores=None):
+	if scores is None: scores = G.degree()
+	return sorted(centrality.top_k(scores, num_landmarks).tolist())
 #------------------------------------------------------------------------------#
 # Choose landmarks with PageRank
-def page_rank_landmarks(G, num_landmarks):
-	pagerank_scores = G.pagerank()#niter=100)
-	top_nodes_indices = sorted(range(len(pagerank_scores)), key=lambda k: pagerank_scores[k], reverse=True)[:num_landmarks]
-	return list(top_nodes_indices)
+def page_rank_landmarks(G, num_landmarks, scores=None, budget=None):
+	if scores is None: scores = pagerank_scores(G, budget)
+	return centrality.top_k(scores, num_landmarks).tolist()
 #------------------------------------------------------------------------------#
 # Choose landmarks with Closeness
-def closeness_landmarks(G, num_landmarks):
-	closeness_scores = G.closeness(mode="ALL", cutoff=0.9)
-	top_nodes_indices = sorted(range(len(closeness_scores)), key=lambda k: closeness_scores[k], reverse=True)[:num_landmarks]
-	return list(top_nodes_indices)
+def closeness_landmarks(G, num_landmarks, scores=None, budget=None, seed=None):
+	if scores is None: scores = closeness_scores(G, budget=budget, seed=seed)
+	return centrality.top_k(scores, num_landmarks).tolist()
 #------------------------------------------------------------------------------#
 # Choose landmarks with Betweenness
-def betweenness_landmarks(G, num_landmarks):
-	betweenness_scores = G.betweenness(directed=False, cutoff=5, weights=None)
-	top_nodes_indices = sorted(range(len(betweenness_scores)), key=lambda k: betweenness_scores[k], reverse=True)[:num_landmarks]
-	return list(top_nodes_indices)
-#------------------------------------------------------------------------------#
-# Choose landmarks with Random
-def random_landmarks(G, num_landmarks):
-	att = G.vs.attributes()[0]
-	Landmarks = random.sample(G.vs[att], num_landmarks)
+def betweenness_landmarks(G, num_landmarks, scores=None):
+	if scores is None: scores = G.betweenness(directed=G.is_directed(), cutoff=5, weights=edge_weights(G))
+	return centrality.top_k(scores, num_landmarks).tolist()
+#------------------------------------------------------------------------------#
+# Choose landmarks with Random (seed makes the choice reproducible)
+def random_landmarks(G, num_landmarks, seed=None):
+	Landmarks = (random if seed is None else random.Random(seed)).sample(range(G.vcount()), num_landmarks)
 	return Landmarks
 
+#------------------------------------------------------------------------------#
+# Choose landmarks with approximate Betweenness from the BFS trees of a sample of random sources
+def sampled_betweenness_landmarks(G, num_landmarks, scores=None, samples=SAMPLES, budget=None, seed=None):
+	if scores is None: scores = sampled_betweenness_scores(G, samples, budget, seed)
+	return centrality.top_k(scores, num_landmarks).tolist()
+
+# Betweenness estimate from samples BFS trees (fewer when the budget in seconds runs out), along the edges of a directed
+# graph; a weighted graph is sampled by hop count, which is enough to rank the candidates
+def sampled_betweenness_scores(G, samples=SAMPLES, budget=None, seed=None):
+	indptr, indices = engine.graph_to_csr(G)
+	sources = np.random.default_rng(seed).permutation(G.vcount())[:samples]
+	return engine.sampled_betweenness(indptr, indices, sources, time_budget=budget)
+#------------------------------------------------------------------------------#
+# Choose landmarks with Degree, but skip the neighbours of landmarks that are already chosen (degree-partitioned)
+# When the budget (seconds) runs out the remaining landmarks are the highest degree vertices not chosen yet
+def degree_partitioned_landmarks(G, num_landmarks, scores=None, budget=None):
+	if scores is None: scores = G.degree()
+	indptr, indices = engine.graph_to_csr(G)
+	return engine.degree_partitioned(indptr, indices, scores, num_landmarks, budget)
+#------------------------------------------------------------------------------#
+# Choose landmarks greedily farthest from the landmarks chosen so far (coverage), starting from the highest degree vertex
+# The BFS row of every landmark is appended to rows (if given) so the landmark matrix does not search them again
+# When the budget (seconds) runs out the remaining landmarks are the highest degree vertices not chosen yet
+# The distances follow the edge weights (and directions), so are the rows
+def farthest_point_landmarks(G, num_landmarks, budget=None, rows=None):
+	indptr, indices, weights = engine.graph_to_weighted_csr(G)
+	return engine.farthest_points(indptr, indices, num_landmarks, budget, rows, dtype=ms.DEFAULT_DTYPE, weights=weights)
+
+#------------------------------------------------------------------------------#
+# PageRank by power iteration on the CSR, along the edges of a directed graph and weighted by the edge weights
+def pagerank_scores(G, budget=None):
+	indptr, indices, weights = engine.graph_to_weighted_csr(G)
+	return centrality.pagerank(indptr, indices, weights, budget=budget)
+
+# Closeness estimated from the distances to a sample of pivots, searched on a process pool; a directed graph is searched
+# over the reversed edges so the closeness follows the distances from a vertex
+def closeness_scores(G, pivots=centrality.PIVOTS, budget=None, seed=None, processes=None):
+	indptr, indices, weights = engine.graph_to_weighted_csr(G, reverse=G.is_directed())
+	return centrality.closeness(indptr, indices, weights, pivots, seed, processes, budget, G.is_directed())
+
+#------------------------------------------------------------------------------#
+# Centrality scores behind a selection method (None for random and farthest-point), these are what makes a selection expensive
+def CentralityScores(G, method, budget=None, seed=None, processes=None):
+	if method == 'D' or method == 'DP': return np.asarray(G.degree())
+	elif method == 'PR': return pagerank_scores(G, budget)
+	elif method == 'C': return closeness_scores(G, budget=budget, seed=seed, processes=processes)
+	elif method == 'B': return np.asarray(G.betweenness(directed=G.is_directed(), cutoff=5, weights=edge_weights(G)))
+	elif method == 'SB': return sampled_betweenness_scores(G, budget=budget, seed=seed)
+	return None
+
+#------------------------------------------------------------------------------#
+SCORE_MEASURES = {'D': "degree", 'DP': "degree", 'PR': "pagerank", 'C': "closeness", 'B': "betweenness", 'SB': "sampled_betweenness"}
+
+# Centrality scores of one graph shared by all selection methods and landmark counts: every measure is computed once
+# (the degree once for D and DP), later requests rank the same scores again
+class ScoreCache:
+	def __init__(self, G, budget=None, seed=None, processes=None):
+		self.G, self.budget, self.seed, self.processes = G, budget, seed, processes
+		self.scores = {}
+
+	#------------------------------------------------------------------------------#
+	# Scores behind method, None for the methods without scores (random and farthest-point)
+	def get(self, method):
+		measure = SCORE_MEASURES.get(method)
+		if measure is None: return None
+		if measure not in self.scores: self.scores[measure] = CentralityScores(self.G, method, self.budget, self.seed, self.processes)
+		return self.scores[measure]
+
+	#------------------------------------------------------------------------------#
+	# Scores of method found elsewhere (the selection cache on disk), they are not computed again
+	def put(self, method, scores):
+		if scores is not None and method in SCORE_MEASURES: self.scores.setdefault(SCORE_MEASURES[method], np.asarray(scores))
+
 #*******************************************************************************
 
-# Computing distance landmarks and every other node (efficient)
-def saveSpace_calc_landmark_matrix(G, Landmarks, path, method, nodes):
-	distances = {}
-	for step, mark in enumerate(Landmarks):
-		custom_progress_bar(step+1, len(Landmarks), task=f"Calculate landmark matrix {method}")
-		inter_dist = {}
-		t = 0
-		for i in G.shortest_paths(mark, nodes, mode="all", weights=None)[0]: #, algorithm="unweighted")# weights = NULL, predecessors = FALSE, inbound.edges = FALSE,
-			inter_dist[nodes[t]] = i
-			t += 1
-		distances[mark] = inter_dist
-	with open(path, 'w') as file:
-		json.dump(distances, file)
-	del distances
+# Map between the vertex indices of G and its external IDs (the first vertex attribute, the names from the edge list)
+def id_map(G):
+	return idmap.IdMap(G.vs[G.vs.attributes()[0]])
+
+#------------------------------------------------------------------------------#
+# Vertex indices as an int64 array (-1 entries are kept), for code that indexes numpy arrays with them
+def vertex_indices(indices):
+	return np.asarray(indices, dtype=np.int64).reshape(-1)
 
 #*******************************************************************************
 
+# Computing distances between the landmarks of several methods and the nodes (all nodes if nodes is None)
+# The BFS searches are spread over a process pool and a landmark picked by several methods is only searched once
+# known_rows can give per method the BFS rows (over all vertices) of its first landmarks, those are not searched again
+# Every finished row is marked on disk, with resume a matrix that was interrupted continues with its missing rows
+# dtype is the storage type of the distances, ms.COMPACT_DTYPE (uint8) takes half the space of the default
+# With parents the BFS tree of every landmark is stored as well (ms.PARENTS_SUFFIX), so paths can be reconstructed
+# A directed graph gets a second matrix per method (ms.backward_path) with the distances towards the landmarks, found
+# over the reversed edges. With edge weights the distances come from the weighted kernel of engine.py and are stored
+# in its dtype (engine.kernel_dtype) instead of dtype
+def calc_landmark_matrices(G, Landmarks, paths, methods, nodes=None, processes=None, fingerprint=None, known_rows=None, resume=False, dtype=ms.DEFAULT_DTYPE, parents=False):
+	if parents and G.is_directed(): raise ValueError("BFS trees are only stored for undirected graphs")
+	if fingerprint is None: fingerprint = graph_fingerprint(G)
+	for reverse in ([False, True] if G.is_directed() else [False]):
+		direction = {method: ms.backward_path(paths[method]) if reverse else paths[method] for method in methods}
+		fill_landmark_matrices(G, Landmarks, direction, methods, nodes, processes, fingerprint, None if reverse else known_rows, resume, dtype, parents, reverse)
+
+#------------------------------------------------------------------------------#
+# One direction of calc_landmark_matrices: the distances from the landmarks, with reverse the distances towards them
+def fill_landmark_matrices(G, Landmarks, paths, methods, nodes, processes, fingerprint, known_rows, resume, dtype, parents, reverse=False):
+	ids = id_map(G)
+	if nodes is None: nodes, columns = np.arange(G.vcount()), None
+	else: columns = vertex_indices(nodes)
+	indptr, indices, weights = engine.graph_to_weighted_csr(G, reverse=reverse)
+	dtype = engine.kernel_dtype(engine.distance_kernel(weights), dtype)
+	jobs, masks = [], []
+	for method in methods:
+		path = paths[method]
+		mask = ms.open_row_mask(path) if resume else None
+		header = ms.read_header(path) if resume and ms.matrix_exists(path) else {}
+		if header.get("landmarks") == np.asarray(Landmarks[method]).tolist() and header.get("nodes") == np.asarray(nodes).tolist() \
+		   and header.get("dtype") == np.dtype(dtype).name and (not parents or ms.parents_exist(path)):
+			if mask is None: continue # complete
+			matrix, _ = ms.open_matrix(path, mode="r+")
+			tree = ms.open_parents(path, mode="r+") if parents else None
+		else:
+			mask = ms.create_row_mask(path, len(Landmarks[method]))
+			matrix = ms.create_matrix(path, Landmarks[method], nodes, method, fingerprint, dtype, ids=ids) # rows are filled by the engine
+			tree = ms.create_parents(path, len(Landmarks[method]), ids.ids) if parents else None
+		landmarks = vertex_indices(Landmarks[method])
+		for position, row in enumerate((known_rows or {}).get(method, [])[:len(landmarks)]):
+			if tree is not None: tree[position] = engine.tree_parents(indptr, indices, row, weights)
+			row = ms.encode_row(np.where(row == ms.unreachable_value(row.dtype), np.inf, row), dtype) # overflow becomes unreachable
+			matrix[position] = row if columns is None else row[columns]
+			mask[position] = True
+		for out in (matrix, tree, mask):
+			if out is not None: out.flush()
+		del matrix, tree
+		landmarks[np.asarray(mask)] = -1 # complete rows are not searched again
+		jobs.append((path+ms.DATA_SUFFIX, landmarks, columns, path+ms.PARENTS_SUFFIX if parents else None))
+		masks.append((path, mask))
+	if not jobs: return
+	def on_rows(rows):
+		for job, position in rows: masks[job][1][position] = True
+		for _, mask in masks: mask.flush()
+	task = f"Calculate {'backward ' if reverse else ''}landmark matrix {', '.join(methods)}"
+	engine.fill_landmark_rows(indptr, indices, jobs, dtype=dtype, processes=processes, progress=lambda done, total: custom_progress_bar(done, total, task=task), on_rows=on_rows, weights=weights, directed=G.is_directed())
+	finished = [path for path, _ in masks]
+	masks.clear() # close the memory maps before the masks are removed
+	for path in finished: ms.finish_row_mask(path)
+
+#------------------------------------------------------------------------------#
+# Computing distance landmarks and every other node (efficient)
+def saveSpace_calc_landmark_matrix(G, Landmarks, path, method, nodes, processes=None):
+	calc_landmark_matrices(G, {method: Landmarks}, {method: path}, [method], nodes=nodes, processes=processes)
+
+#------------------------------------------------------------------------------#
 # Computing distance landmarks and every other node
-def calc_landmark_matrix(G, Landmarks, path, method):
-	distances = {}
-	for step, mark in enumerate(Landmarks):
-		custom_progress_bar(step+1, len(Landmarks), task=f"Calculate landmark matrix {method}")
-		inter_dist = []
-		for i in G.shortest_paths(mark, G.vs, mode="all", weights=None)[0]: #, algorithm="unweighted")# weights = NULL, predecessors = FALSE, inbound.edges = FALSE,
-			inter_dist.append(i)
-		distances[mark] = inter_dist
-	with open(path, 'w') as file:
-		json.dump(distances, file)
-	del distances
+def calc_landmark_matrix(G, Landmarks, path, method, processes=None):
+	calc_landmark_matrices(G, {method: Landmarks}, {method: path}, [method], processes=processes)
 
 #*******************************************************************************
 
-# Selecting random node pairs
+# Selecting random node pairs (vertex indices), the order of a pair only counts in a directed graph
 def SelectRandomNodePairs(G, numPairs, randomseed):
 	pairs = {}
 	random.seed(randomseed)
-	nodes = list(G.vs[G.vs.attributes()[0]])
+	nodes = range(G.vcount())
 	while len(pairs) < numPairs:
 		#pairs.append( random.sample(list(G.vs["id"]), k=2) )
 		a,b = random.sample(nodes, k=2)
-		pairs[tuple(sorted([a,b]))] = None
+		pairs[(a,b) if G.is_directed() else tuple(sorted([a,b]))] = None
 	return list(pairs.keys())
 
 #*******************************************************************************
 
-# Calculating actual distances between nodes in pairs
-def CalcAndStoreRealDist(G, pairs, path, name):
-	real_distances = {}
-	for step, (a,b) in enumerate(pairs):
-		custom_progress_bar(step+1, len(pairs), task="Calculate real distances")
-		shortest = G.shortest_paths(a, b, mode="all", weights=None)[0][0]
-		real_distances[str(tuple(sorted([a,b])))] = shortest
-	with open(f"{path}{name}_real_distances.json", 'w') as file:
-		json.dump(real_distances, file)
-	return real_distances
+# Calculating actual distances between nodes in pairs, the result is an array in the order of the pairs (inf if not connected)
+# The pairs are grouped by source so that one BFS answers all targets of a source, the searches run on a process pool
+# Weighted and directed graphs are searched with the kernel of their weights, along the edges from the first node
+def CalcAndStoreRealDist(G, pairs, path, name, processes=None):
+	indptr, indices, weights = engine.graph_to_weighted_csr(G)
+	pair_vertices = vertex_indices(pairs).reshape(-1, 2)
+	real_distances = engine.pair_distances(indptr, indices, pair_vertices, dtype=ms.DEFAULT_DTYPE, processes=processes,
+										   progress=lambda done, total: custom_progress_bar(done, total, task="Calculate real distances"),
+										   weights=weights, directed=G.is_directed())
+	np.save(f"{path}{name}_real_distances.npy", real_distances) # compact array, position i holds the distance of pair i
+	return np.where(real_distances == ms.unreachable_value(real_distances.dtype), np.inf, real_distances.astype(np.float64))
 
 #*******************************************************************************
 
-# input is a list of landmarks, pairs of nodes, and the landmark distance matrix
-def CalcEstimateDist(landmarks, pairs, matrix, numLandmarks):
-	estimates = []
-	for s,t in pairs:
-		shortest = float('inf')
-		for mark in landmarks[:numLandmarks]:
-			dist_st = matrix[str(mark)][str(s)] + matrix[str(mark)][str(t)]
-			shortest = min(shortest, dist_st)
-		estimates.append(shortest)
-	return estimates
+# Matrix columns of the sources and of the targets of the pairs
+def pair_columns(node_index, pairs):
+	columns = node_index.to_index(np.asarray(pairs, dtype=np.int64).reshape(-1, 2)).astype(np.int64)
+	return columns[:, 0], columns[:, 1]
+
+#------------------------------------------------------------------------------#
+# Type in which two distances of a matrix are summed and the value that stands for unreachable in it
+# uint8 matrices are summed in uint16, twice as many values per vector; big is larger than any sum of two real
+# distances and 2*big still fits
+def sum_type(dtype):
+	dtype = np.dtype(dtype)
+	if dtype.kind == "f": return np.float64, np.float64(np.inf)
+	work, big = {1: (np.uint16, 2**14), 2: (np.int32, 2**29)}.get(dtype.itemsize, (np.int64, 2**61))
+	return work, work(big)
+
+#------------------------------------------------------------------------------#
+# Estimate the distance of all pairs for every number of landmarks in landmark_range in one pass
+# matrix is a landmarks x nodes array, node_index (ms.node_index) maps a vertex to its column in the matrix
+# For a directed graph backward is the matrix of distances towards the landmarks: d(s,t) <= d(s,l) + d(l,t)
+def CalcEstimateDistRange(matrix, node_index, pairs, landmark_range, chunk_size=4096, backward=None):
+	unreachable = ms.unreachable_value(matrix.dtype)
+	work, big = sum_type(matrix.dtype)
+	numLandmarks = min(max(landmark_range), matrix.shape[0])
+	prefix = np.minimum(np.asarray(landmark_range), numLandmarks) - 1 # row of the cumulative minimum per landmark count
+	sources, targets = pair_columns(node_index, pairs)
+	rows = matrix[:numLandmarks]
+	source_rows = rows if backward is None else backward[:numLandmarks]
+	estimates = np.empty((len(landmark_range), len(pairs)), dtype=np.float64)
+	for start in range(0, len(pairs), chunk_size): # chunks keep the landmarks x pairs buffer small
+		end = start + chunk_size
+		dist_s = source_rows[:, sources[start:end]].astype(work)
+		dist_t = rows[:, targets[start:end]].astype(work)
+		dist_s[dist_s == unreachable] = big
+		dist_t[dist_t == unreachable] = big
+		dist_st = dist_s + dist_t
+		np.minimum.accumulate(dist_st, axis=0, out=dist_st) # best estimate using the first i+1 landmarks
+		estimates[:, start:end] = dist_st[prefix]
+	estimates[estimates >= big] = np.inf
+	return {num: estimates[idx] for idx, num in enumerate(landmark_range)}
+
+#------------------------------------------------------------------------------#
+# input is the landmark distance matrix, its node to column map, pairs of nodes, and the number of landmarks to use
+def CalcEstimateDist(matrix, node_index, pairs, numLandmarks, backward=None):
+	return CalcEstimateDistRange(matrix, node_index, pairs, [numLandmarks], backward=backward)[numLandmarks]
+
+#------------------------------------------------------------------------------#
+# Lower bound max|d(l,s)-d(l,t)| and upper bound min(d(l,s)+d(l,t)) of every pair using the first numLandmarks landmarks
+# The lower bound is inf when a landmark reaches only one of the two nodes (they are not connected)
+# For a directed graph (backward given) the lower bound is max(d(l,t)-d(l,s), d(s,l)-d(t,l)), inf when l reaches s but
+# not t or t reaches l but s does not
+def CalcBoundsDist(matrix, node_index, pairs, numLandmarks, chunk_size=4096, backward=None):
+	unreachable = ms.unreachable_value(matrix.dtype)
+	sources, targets = pair_columns(node_index, pairs)
+	rows = matrix[:numLandmarks]
+	lower = np.zeros(len(pairs), dtype=np.float64)
+	for start in range(0, len(pairs), chunk_size):
+		end = start + chunk_size
+		dist_s = rows[:, sources[start:end]].astype(np.float64)
+		dist_t = rows[:, targets[start:end]].astype(np.float64)
+		reach_s, reach_t = dist_s != unreachable, dist_t != unreachable
+		if backward is None:
+			if len(rows): lower[start:end] = np.where(reach_s & reach_t, np.abs(dist_s - dist_t), 0).max(axis=0)
+			lower[start:end][(reach_s != reach_t).any(axis=0)] = np.inf
+			continue
+		to_s = backward[:numLandmarks, sources[start:end]].astype(np.float64)
+		to_t = backward[:numLandmarks, targets[start:end]].astype(np.float64)
+		from_l, to_l = reach_s & reach_t, (to_s != unreachable) & (to_t != unreachable)
+		if len(rows): lower[start:end] = np.maximum(np.where(from_l, dist_t - dist_s, 0), np.where(to_l, to_s - to_t, 0)).max(axis=0)
+		lower[start:end][((reach_s & ~reach_t) | ((to_s == unreachable) & (to_t != unreachable))).any(axis=0)] = np.inf
+	return lower, CalcEstimateDist(matrix, node_index, pairs, numLandmarks, backward=backward)
+
+#------------------------------------------------------------------------------#
+# Exact distances with a bidirectional BFS pruned by the landmark bounds (ALT style), the landmark matrix only needs
+# columns for some nodes but the pruning is strongest when it covers all of them (calc_landmark_matrix)
+# Returns the distances (inf if not connected) and the number of vertices expanded for every pair
+# The bidirectional BFS needs an undirected graph with unit weights
+def CalcExactDistALT(G, matrix, node_index, pairs, numLandmarks, indptr=None, indices=None):
+	if G.is_directed() or edge_weights(G): raise ValueError("The ALT search only supports undirected unweighted graphs")
+	if indptr is None: indptr, indices = engine.graph_to_csr(G)
+	unreachable = np.iinfo(matrix.dtype).max
+	rows = np.asarray(matrix[:numLandmarks]) # the bounds touch scattered columns, read the rows once
+	column_of = np.full(G.vcount(), -1, dtype=np.int64)
+	column_of[node_index.ids] = np.arange(len(node_index))
+	lower, upper = CalcBoundsDist(matrix, node_index, pairs, numLandmarks)
+	pair_vertices = vertex_indices(pairs).reshape(-1, 2)
+	dist = np.empty(len(pairs), dtype=np.float64)
+	expanded = np.zeros(len(pairs), dtype=np.int64)
+	for i, (s, t) in enumerate(pair_vertices):
+		custom_progress_bar(i+1, len(pairs), task="Exact distances (ALT)")
+		if lower[i] == upper[i]: # the bounds already agree, no search needed
+			dist[i] = upper[i]
+			continue
+		endpoints = (t, s) # side 0 searches from s towards t, side 1 from t towards s
+		bound = lambda side, vertices: engine.landmark_lower_bounds(rows, column_of, vertices, endpoints[side], unreachable)
+		dist[i], expanded[i] = engine.bidirectional_bfs(indptr, indices, s, t, lower_bound=bound, upper=upper[i])
+	return dist, expanded
 
 #*******************************************************************************
 
-# Picking the right landmark selection function
-def LandmarkSelection(G, method, numLandmarks):
-	if method == 'D': Landmarks = degree_landmarks(G, numLandmarks) # Degree
-	elif method == 'PR': Landmarks = page_rank_landmarks(G, numLandmarks)  # PageRank
-	elif method == 'C': Landmarks = closeness_landmarks(G, numLandmarks) # Closeness
-	elif method == 'B': Landmarks = betweenness_landmarks(G, numLandmarks) # Betweenness
-	elif method == 'R': Landmarks = random_landmarks(G, numLandmarks) # Random
+# Picking the right landmark selection function, scores can be given to reuse earlier computed centrality scores
+# budget is the time budget in seconds of the scalable methods, rows collects the BFS rows of farthest-point selection
+def LandmarkSelection(G, method, numLandmarks, scores=None, seed=None, budget=None, rows=None):
+	if method == 'D': Landmarks = degree_landmarks(G, numLandmarks, scores) # Degree
+	elif method == 'PR': Landmarks = page_rank_landmarks(G, numLandmarks, scores, budget)  # PageRank
+	elif method == 'C': Landmarks = closeness_landmarks(G, numLandmarks, scores, budget, seed) # Closeness
+	elif method == 'B': Landmarks = betweenness_landmarks(G, numLandmarks, scores) # Betweenness
+	elif method == 'R': Landmarks = random_landmarks(G, numLandmarks, seed) # Random
+	elif method == 'SB': Landmarks = sampled_betweenness_landmarks(G, numLandmarks, scores, budget=budget, seed=seed) # Sampled betweenness
+	elif method == 'DP': Landmarks = degree_partitioned_landmarks(G, numLandmarks, scores, budget) # Degree-partitioned
+	elif method == 'FP': Landmarks = farthest_point_landmarks(G, numLandmarks, budget, rows) # Farthest-point
 	else: exit("Method is not implementend!")
 	return Landmarks
 
 #*******************************************************************************
 
-# Produce loss plot and save it
-def combined_loss_plot_methods(losses_zip, landmark_range, methods, title, path):
+# Produce loss plot and save it, with costs (per method the query time of every landmark count) also a plot of the
+# loss against the query time with the Pareto front over all methods and landmark counts
+def combined_loss_plot_methods(losses_zip, landmark_range, methods, title, path, costs=None):
 	fig, plot = plt.subplots(figsize=(8, 8))
 
 	for idx, losses in enumerate(losses_zip):
@@ -177,7 +441,7 @@ def combined_loss_plot_methods(losses_zip, landmark_range, methods, title, path)
 
 	#plot.set_title("Loss values using different sizes " + title, fontsize=23)
 	plot.set_xlabel("Number of " + title, fontsize=21)
-	plot.set_ylabel("Computed loss (approx - real) / real", fontsize=21)
+	plot.set_ylabel("Mean loss (approx - real) / real", fontsize=21)
 
 	plot.spines['top'].set_visible(False)
 	plot.spines['right'].set_visible(False)
@@ -188,6 +452,32 @@ def combined_loss_plot_methods(losses_zip, landmark_range, methods, title, path)
 	plt.savefig(f'{path}_losses.png')
 	print(f"Losses-plot is stored as {path}_losses.png")
 	plt.close()
+	if costs is not None: pareto_plot(losses_zip, costs, landmark_range, methods, path)
+
+#------------------------------------------------------------------------------#
+# Loss against query time of every configuration (method, number of landmarks), the front is drawn as a step line
+def pareto_plot(losses_zip, costs, landmark_range, methods, path):
+	fig, plot = plt.subplots(figsize=(8, 8))
+	for idx, (losses, cost) in enumerate(zip(losses_zip, costs)):
+		plot.scatter(cost, losses, label=methods[idx], s=60)
+		for numLandmarks, x, y in zip(landmark_range, cost, losses): plot.annotate(str(numLandmarks), (x, y), fontsize=11)
+	all_costs = np.concatenate([np.asarray(cost, dtype=np.float64) for cost in costs])
+	all_losses = np.concatenate([np.asarray(losses, dtype=np.float64) for losses in losses_zip])
+	front = ev.pareto_front(all_costs, all_losses)
+	plot.step(all_costs[front], all_losses[front], where="post", color="black", linewidth=1.5, label="Pareto front")
+
+	plot.set_xscale("log")
+	plot.set_xlabel("Query time (µs per pair)", fontsize=21)
+	plot.set_ylabel("Mean loss (approx - real) / real", fontsize=21)
+	plot.spines['top'].set_visible(False)
+	plot.spines['right'].set_visible(False)
+	plt.xticks(fontsize=19)
+	plt.yticks(fontsize=19)
+	plot.legend(fontsize=16)
+	plt.tight_layout()
+	plt.savefig(f'{path}_pareto.png')
+	print(f"Pareto-plot is stored as {path}_pareto.png")
+	plt.close()
 
 
 
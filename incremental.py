@@ -0,0 +1,187 @@
+import argparse
+import heapq
+import os
+import numpy as np
+import matrixstore as ms # binary landmark matrices
+import engine # CSR adjacency
+import idmap # external IDs <-> vertex indices
+import ifunctions as f # graph helpers
+
+# Incremental updates of a landmark matrix over all nodes (calc_landmark_matrix) when edges are added or removed.
+# Every landmark row is repaired with a dynamic BFS that only visits the vertices whose distance changes:
+#   removals:  the vertices that lost all their shortest path parents are found in order of their old distance,
+#              then their distances are recomputed from the unaffected vertices around them
+#   additions: distances that got shorter are propagated outwards from the endpoints of the new edges
+# The largest connected component is only recomputed when a removal disconnected vertices from the landmarks.
+# A delta file has one change per line: "+ u v" adds the edge, "- u v" removes it ('%' lines are comments).
+
+#*******************************************************************************
+
+def read_delta(path):
+	added, removed = [], []
+	with open(path, 'r') as file:
+		for line in file:
+			parts = line.split()
+			if not parts or parts[0].startswith('%'): continue
+			if parts[0] not in ('+', '-') or len(parts) < 3: raise ValueError(f"Bad delta line: {line.strip()}")
+			(added if parts[0] == '+' else removed).append((parts[1], parts[2]))
+	return added, removed
+
+#*******************************************************************************
+
+def neighbours_of(indptr, indices, vertex):
+	return indices[indptr[vertex]:indptr[vertex+1]]
+
+#------------------------------------------------------------------------------#
+# Repair a row of distances after the removal of edges (indptr, indices is the graph without them)
+# Returns the number of vertices whose distance was recomputed
+def repair_removals(dist, indptr, indices, removed, unreachable):
+	heap = []
+	for a, b in removed:
+		if dist[a] == unreachable or abs(int(dist[a]) - int(dist[b])) != 1: continue # the edge was not on a shortest path
+		child = a if dist[a] > dist[b] else b
+		heapq.heappush(heap, (int(dist[child]), int(child)))
+	affected = set()
+	while heap: # in order of the old distance, so the parents of a vertex are decided before the vertex itself
+		level, vertex = heapq.heappop(heap)
+		if vertex in affected: continue
+		if any(dist[x] == level-1 and int(x) not in affected for x in neighbours_of(indptr, indices, vertex)): continue # still has a parent
+		affected.add(vertex)
+		for x in neighbours_of(indptr, indices, vertex):
+			if dist[x] == level+1: heapq.heappush(heap, (level+1, int(x)))
+	if not affected: return 0
+
+	heap = [] # distances of the affected vertices through their unaffected neighbours, then Dijkstra inside the region
+	for vertex in affected:
+		known = [int(dist[x]) for x in neighbours_of(indptr, indices, vertex) if int(x) not in affected and dist[x] != unreachable]
+		dist[vertex] = unreachable
+		if known: heapq.heappush(heap, (min(known)+1, vertex))
+	while heap:
+		level, vertex = heapq.heappop(heap)
+		if level >= dist[vertex] or level >= unreachable: continue
+		dist[vertex] = level
+		for x in neighbours_of(indptr, indices, vertex):
+			if int(x) in affected and level+1 < dist[x]: heapq.heappush(heap, (level+1, int(x)))
+	return len(affected)
+
+#------------------------------------------------------------------------------#
+# Repair a row of distances after the addition of edges (indptr, indices is the graph with them)
+# Returns the number of vertices whose distance got shorter
+def repair_additions(dist, indptr, indices, added, unreachable):
+	heap = []
+	for a, b in added:
+		for x, y in ((a, b), (b, a)):
+			if dist[x] != unreachable and dist[x]+1 < dist[y]: heapq.heappush(heap, (int(dist[x])+1, int(y)))
+	changed = set()
+	while heap:
+		level, vertex = heapq.heappop(heap)
+		if level >= dist[vertex] or level >= unreachable: continue
+		dist[vertex] = level
+		changed.add(vertex)
+		for x in neighbours_of(indptr, indices, vertex):
+			if level+1 < dist[x]: heapq.heappush(heap, (level+1, int(x)))
+	return len(changed)
+
+#*******************************************************************************
+
+# Rewrite a matrix with other rows and columns: rows[i] is the old row of new row i, columns[i] the old column of new
+# column i (-1 for a new, unreachable column). landmarks and nodes are the vertex indices of the new rows and columns,
+# names the external IDs of all vertices
+def rewrite_matrix(path, header, rows, landmarks, columns, nodes, names):
+	matrix, _ = ms.open_matrix(path)
+	columns = np.asarray(columns, dtype=np.int64)
+	data = np.full((len(rows), len(columns)), ms.unreachable_value(matrix.dtype), dtype=matrix.dtype)
+	old = np.flatnonzero(columns >= 0)
+	data[:, old] = matrix[rows][:, columns[old]]
+	del matrix
+	tmp = path+".tmp"
+	out = ms.create_matrix(tmp, landmarks, nodes, header["method"], header["fingerprint"], dtype=data.dtype,
+						 ids=idmap.IdMap(np.asarray(names).astype(str)))
+	out[:] = data
+	out.flush()
+	del out
+	os.replace(tmp+ms.DATA_SUFFIX, path+ms.DATA_SUFFIX)
+	os.replace(tmp+ms.HEADER_SUFFIX, path+ms.HEADER_SUFFIX)
+
+#------------------------------------------------------------------------------#
+# Apply the changes in delta_path to G and repair the landmark matrix at path in place, returns the updated graph
+def update_landmark_matrix(G, path, delta_path):
+	added, removed = read_delta(delta_path)
+	header = ms.read_header(path)
+	att = G.vs.attributes()[0]
+	names = list(G.vs[att])
+	if header["fingerprint"] != f.graph_fingerprint(G): raise ValueError(f"{path} does not belong to this graph")
+	if G.is_directed() or f.edge_weights(G): raise ValueError("Incremental updates repair unit weight distances of undirected graphs only")
+	if "blocks" in header: raise ValueError(f"{path} is compressed, incremental updates need the uncompressed matrix")
+	if header["nodes"] != list(range(G.vcount())):
+		raise ValueError(f"{path} does not cover all nodes, incremental updates need a matrix from calc_landmark_matrix")
+	G.arrays = None # the edges change below, the parsed edge list no longer describes G
+
+	index = {str(name): idx for idx, name in enumerate(names)}
+	new = list(dict.fromkeys(str(node) for pair in added for node in pair if str(node) not in index))
+	if new: # new vertices get an unreachable column
+		G.add_vertices(len(new), attributes={att: new})
+		index.update((name, len(names)+i) for i, name in enumerate(new))
+		names += new
+		rows = list(range(len(header["landmarks"])))
+		rewrite_matrix(path, header, rows, header["landmarks"], list(range(len(names)-len(new))) + [-1]*len(new), list(range(len(names))), names)
+
+	removed = list(dict.fromkeys(tuple(sorted((index[str(a)], index[str(b)]))) for a, b in removed if str(a) in index and str(b) in index))
+	removed = [pair for pair, eid in zip(removed, G.get_eids(removed, error=False)) if eid >= 0]
+	added = [(index[str(a)], index[str(b)]) for a, b in added]
+	matrix, _ = ms.open_matrix(path, mode="r+")
+	unreachable = ms.unreachable_value(matrix.dtype)
+	repaired = 0
+	if removed:
+		G.delete_edges(G.get_eids(removed))
+		indptr, indices = engine.graph_to_csr(G)
+		for row in range(matrix.shape[0]): repaired += repair_removals(matrix[row], indptr, indices, removed, unreachable)
+	if added:
+		G.add_edges(added)
+		indptr, indices = engine.graph_to_csr(G)
+		for row in range(matrix.shape[0]): repaired += repair_additions(matrix[row], indptr, indices, added, unreachable)
+	matrix.flush()
+	split = matrix.shape[0] > 0 and bool((matrix[0] == unreachable).any()) # the landmarks lie in one component
+	del matrix
+
+	if split: # only now the component can have changed
+		components = G.components()
+		giant = components.sizes().index(max(components.sizes()))
+		kept = [v for v, c in enumerate(components.membership) if c == giant]
+		G = f.largest_cc(G)
+		position = {v: i for i, v in enumerate(kept)} # vertex indices shift in the component
+		rows, landmarks = [], []
+		for row, landmark in enumerate(header["landmarks"]):
+			if landmark not in position: continue
+			rows.append(row)
+			landmarks.append(position[landmark])
+		if len(rows) < len(header["landmarks"]): print(f"{len(header['landmarks'])-len(rows)} landmarks left the largest component, their rows are dropped")
+		rewrite_matrix(path, header, rows, landmarks, kept, list(range(len(kept))), [names[v] for v in kept])
+
+	header = ms.read_header(path)
+	header["fingerprint"] = f.graph_fingerprint(G)
+	ms.write_header(path, header)
+	print(f"Applied {len(added)} additions and {len(removed)} removals, {repaired} distances repaired")
+	return G
+
+#*******************************************************************************
+
+# Write the graph as an edge list of vertex names, so the next delta can be applied to it
+def write_edgelist(G, path):
+	names = G.vs[G.vs.attributes()[0]]
+	with open(path, 'w') as file:
+		for a, b in G.get_edgelist(): file.write(f"{names[a]} {names[b]}\n")
+
+#*******************************************************************************
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Update a stored landmark matrix with an edge delta file")
+	parser.add_argument("network", help="edge list the matrix was built from")
+	parser.add_argument("matrix", help="matrix path without suffix, as written by calc_landmark_matrix")
+	parser.add_argument("delta", help="file with '+ u v' and '- u v' lines")
+	parser.add_argument("--out", default=None, help="write the updated edge list here")
+	args = parser.parse_args()
+
+	G = f.largest_cc(f.read_graph_file(args.network))
+	G = update_landmark_matrix(G, args.matrix, args.delta)
+	if args.out: write_edgelist(G, args.out)
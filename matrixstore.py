@@ -0,0 +1,171 @@
+import json
+import os
+import zlib
+import numpy as np
+import idmap # internal vertex indices <-> external IDs
+
+# A landmark matrix is stored as two files next to each other:
+#   <path>.npy   landmarks x nodes array with the distances (np.load / np.memmap compatible)
+#   <path>.json  small header with the landmarks, the node of every column (vertex indices and external IDs),
+#                the method and the graph fingerprint
+# While a matrix is being built <path>.rows.npy marks the rows that are complete, it is removed when all rows are.
+# A finished matrix can be compressed into <path>.blocks: blocks of rows compressed with zlib one after the other, the
+# header then has the block size and offsets. Such a matrix is loaded into memory instead of memory mapped.
+# Optionally <path>.parents.npy holds per landmark the parent of every vertex in its BFS tree (vertex indices, -1 for
+# the landmark itself and unreached vertices), the header then lists all vertices under "vertices".
+# Distances fit in uint8 for most graphs: the largest value marks unreachable nodes and distances that do not fit.
+# Weighted distances are stored as uint32 (integer weights) or float32 (inf marks unreachable), see engine.kernel_dtype.
+# A directed graph has a second matrix <path>.backward with the distances from every node to the landmarks, the
+# matrix at <path> has the distances from the landmarks to every node.
+DATA_SUFFIX = ".npy"
+HEADER_SUFFIX = ".json"
+ROWS_SUFFIX = ".rows.npy"
+PARENTS_SUFFIX = ".parents.npy"
+BLOCKS_SUFFIX = ".blocks"
+BACKWARD_SUFFIX = ".backward"
+DEFAULT_DTYPE = np.uint16
+COMPACT_DTYPE = np.uint8
+BLOCK_ROWS = 16
+
+#*******************************************************************************
+
+# Value that marks an unreachable node in a matrix of this dtype
+def unreachable_value(dtype):
+	return np.inf if np.dtype(dtype).kind == "f" else int(np.iinfo(dtype).max)
+
+#------------------------------------------------------------------------------#
+# Convert one row of distances (inf for unreachable) to the storage dtype, distances that do not fit become unreachable
+def encode_row(dists, dtype=DEFAULT_DTYPE):
+	dists = np.asarray(dists, dtype=np.float64)
+	return np.where(dists < unreachable_value(dtype), dists, unreachable_value(dtype)).astype(dtype)
+
+#*******************************************************************************
+
+def read_header(path):
+	with open(path+HEADER_SUFFIX, 'r') as file:
+		return json.load(file)
+
+#------------------------------------------------------------------------------#
+def write_header(path, header):
+	with open(path+HEADER_SUFFIX, 'w') as file:
+		json.dump(header, file)
+
+#------------------------------------------------------------------------------#
+def matrix_exists(path):
+	return (os.path.exists(path+DATA_SUFFIX) or os.path.exists(path+BLOCKS_SUFFIX)) and os.path.exists(path+HEADER_SUFFIX)
+
+#------------------------------------------------------------------------------#
+# Map every node (vertex index) to its column in the matrix
+def node_index(header):
+	return idmap.IdMap(header["nodes"])
+
+#------------------------------------------------------------------------------#
+# Map every external node ID to its column in the matrix
+def node_ids(header):
+	return idmap.IdMap(header["node_ids"])
+
+#*******************************************************************************
+
+# Create an empty matrix on disk and return it as a writable memory map, rows can be filled one landmark at a time
+# landmarks and nodes are vertex indices, ids (an IdMap of the graph) gives their external IDs for the header
+def create_matrix(path, landmarks, nodes, method, fingerprint, dtype=DEFAULT_DTYPE, ids=None):
+	dtype = np.dtype(dtype)
+	header = {"landmarks": np.asarray(landmarks).tolist(), # tolist turns numpy scalars into json friendly values
+			  "nodes": np.asarray(nodes).tolist(),
+			  "landmark_ids": ids.to_id(landmarks).tolist() if ids is not None else np.asarray(landmarks).tolist(),
+			  "node_ids": ids.to_id(nodes).tolist() if ids is not None else np.asarray(nodes).tolist(),
+			  "method": method,
+			  "fingerprint": fingerprint,
+			  "dtype": dtype.name,
+			  "unreachable": unreachable_value(dtype)}
+	write_header(path, header)
+	return np.lib.format.open_memmap(path+DATA_SUFFIX, mode="w+", dtype=dtype, shape=(len(landmarks), len(nodes)))
+
+#------------------------------------------------------------------------------#
+# Open a stored matrix as a memory map, only the rows and columns that are used get paged in
+# A compressed matrix is decompressed into memory (read only use)
+def open_matrix(path, mode="r"):
+	header = read_header(path)
+	if "blocks" in header: return load_compressed(path, header), header
+	matrix = np.load(path+DATA_SUFFIX, mmap_mode=mode)
+	return matrix, header
+
+#------------------------------------------------------------------------------#
+# Path of the matrix with the distances towards the landmarks (directed graphs)
+def backward_path(path):
+	return path+BACKWARD_SUFFIX
+
+#------------------------------------------------------------------------------#
+# The backward matrix of a directed graph and its header, (None, None) for an undirected graph
+def open_backward(path, mode="r"):
+	if not matrix_exists(backward_path(path)): return None, None
+	return open_matrix(backward_path(path), mode)
+
+#*******************************************************************************
+
+# Replace the .npy file of a finished matrix by zlib compressed blocks of block_rows rows
+def compress_matrix(path, block_rows=BLOCK_ROWS, level=6):
+	header = read_header(path)
+	if "blocks" in header: return
+	matrix = np.load(path+DATA_SUFFIX, mmap_mode="r")
+	offsets = [0]
+	with open(path+BLOCKS_SUFFIX+".tmp", 'wb') as file:
+		for start in range(0, matrix.shape[0], block_rows):
+			offsets.append(offsets[-1] + file.write(zlib.compress(np.ascontiguousarray(matrix[start:start+block_rows]).tobytes(), level)))
+	header["blocks"] = {"rows": block_rows, "offsets": offsets, "shape": list(matrix.shape)}
+	del matrix
+	os.replace(path+BLOCKS_SUFFIX+".tmp", path+BLOCKS_SUFFIX)
+	write_header(path, header)
+	os.remove(path+DATA_SUFFIX)
+
+#------------------------------------------------------------------------------#
+# Decompress a matrix block by block straight into one preallocated array
+def load_compressed(path, header=None):
+	header = header or read_header(path)
+	blocks = header["blocks"]
+	matrix = np.empty(blocks["shape"], dtype=np.dtype(header["dtype"]))
+	flat = matrix.reshape(-1).view(np.uint8)
+	offsets = blocks["offsets"]
+	with open(path+BLOCKS_SUFFIX, 'rb') as file:
+		position = 0
+		for start, end in zip(offsets[:-1], offsets[1:]):
+			data = zlib.decompress(file.read(end-start))
+			flat[position:position+len(data)] = np.frombuffer(data, dtype=np.uint8)
+			position += len(data)
+	return matrix
+
+#*******************************************************************************
+
+# Mask of the complete rows of a matrix that is being built, written before the matrix so a crash never leaves
+# a matrix without it behind
+def create_row_mask(path, count):
+	return np.lib.format.open_memmap(path+ROWS_SUFFIX, mode="w+", dtype=bool, shape=(count,))
+
+#------------------------------------------------------------------------------#
+# Mask of a partially built matrix, None when the matrix is complete (or was never started)
+def open_row_mask(path):
+	if not os.path.exists(path+ROWS_SUFFIX): return None
+	return np.load(path+ROWS_SUFFIX, mmap_mode="r+")
+
+#------------------------------------------------------------------------------#
+def finish_row_mask(path):
+	if os.path.exists(path+ROWS_SUFFIX): os.remove(path+ROWS_SUFFIX)
+
+#*******************************************************************************
+
+# Create the BFS tree parents next to a matrix as a writable memory map, vertices are the IDs of all vertices
+def create_parents(path, count, vertices):
+	header = read_header(path)
+	header["vertices"] = np.asarray(vertices).tolist()
+	write_header(path, header)
+	parents = np.lib.format.open_memmap(path+PARENTS_SUFFIX, mode="w+", dtype=np.int32, shape=(count, len(vertices)))
+	parents[:] = -1
+	return parents
+
+#------------------------------------------------------------------------------#
+def parents_exist(path):
+	return os.path.exists(path+PARENTS_SUFFIX) and "vertices" in read_header(path)
+
+#------------------------------------------------------------------------------#
+def open_parents(path, mode="r"):
+	return np.load(path+PARENTS_SUFFIX, mmap_mode=mode)
@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import numpy as np
+import edgelist as el # chunked KONECT edge list reader
+import engine # CSR BFS, reads a memory mapped CSR block by block
+import centrality # top-k selection of the scores
+import idmap # external IDs <-> vertex indices
+import matrixstore as ms # binary landmark matrices
+
+# Out-of-core mode for graphs larger than RAM. The edge list is converted once into a CSR on disk: a directory with
+# indptr.npy, indices.npy (neighbour lists sorted) and ids.npy, vertex i is the i-th smallest ID. Afterwards the
+# arrays are only memory mapped. The conversion streams the file in chunks, the connected components come from a
+# union-find whose parent array is a memory map as well, and the BFS in engine.py reads the edges one block at a
+# time with one frontier bitmap word per vertex. Memory is bounded by per-vertex arrays and the output rows of the
+# landmark matrix, never by the edges. Only the selection methods that need no igraph are available here.
+GRAPH_FILE = "graph.json"
+LCC_FOLDER = "lcc"
+ROW_BLOCK = 1 << 22 # edges per block for sorting, filtering and the union-find
+METHODS = ["D", "R", "DP", "FP"]
+
+#*******************************************************************************
+
+def array_path(directory, name):
+	return os.path.join(directory, name+".npy")
+
+#------------------------------------------------------------------------------#
+def create_array(directory, name, dtype, shape):
+	return np.lib.format.open_memmap(array_path(directory, name), mode="w+", dtype=dtype, shape=shape)
+
+#------------------------------------------------------------------------------#
+def read_graph_header(directory):
+	path = os.path.join(directory, GRAPH_FILE)
+	if not os.path.exists(path): return None
+	with open(path, 'r') as file:
+		return json.load(file)
+
+#------------------------------------------------------------------------------#
+# The header is written last, a directory without it holds an unfinished conversion
+def write_graph_header(directory, header):
+	with open(os.path.join(directory, GRAPH_FILE+".tmp"), 'w') as file:
+		json.dump(header, file)
+	os.replace(os.path.join(directory, GRAPH_FILE+".tmp"), os.path.join(directory, GRAPH_FILE))
+
+#------------------------------------------------------------------------------#
+# Memory mapped graph: dict with indptr, indices, ids, its directory and fingerprint
+def open_graph(directory):
+	header = read_graph_header(directory)
+	graph = {name: np.load(array_path(directory, name), mmap_mode="r") for name in ("indptr", "indices", "ids")}
+	graph.update(directory=directory, fingerprint=header["fingerprint"])
+	return graph
+
+#------------------------------------------------------------------------------#
+# Hash of the IDs and the CSR, read block by block (not the same value as f.graph_fingerprint of an igraph graph)
+def disk_fingerprint(directory):
+	digest = hashlib.sha1()
+	for name in ("ids", "indptr", "indices"):
+		array = np.load(array_path(directory, name), mmap_mode="r")
+		for start in range(0, len(array), ROW_BLOCK): digest.update(np.ascontiguousarray(array[start:start+ROW_BLOCK]).tobytes())
+	return digest.hexdigest()
+
+#*******************************************************************************
+
+# Sort the neighbour list of every vertex, one block of rows at a time
+def sort_rows(indptr, indices):
+	for start, end in engine.vertex_blocks(indptr, ROW_BLOCK):
+		first, last = indptr[start], indptr[end]
+		if last - first < 2: continue
+		block = np.asarray(indices[first:last])
+		owner = np.repeat(np.arange(start, end), np.diff(indptr[start:end+1]))
+		indices[first:last] = block[np.lexsort((block, owner))]
+
+#------------------------------------------------------------------------------#
+# Convert the edge list into a CSR on disk in three passes over the file: the IDs, the degrees, the neighbours
+def convert_edgelist(path, directory, chunk_lines=el.CHUNK_LINES):
+	os.makedirs(directory, exist_ok=True)
+	if os.path.exists(os.path.join(directory, GRAPH_FILE)): os.remove(os.path.join(directory, GRAPH_FILE))
+	ids = np.empty(0, dtype=np.int64)
+	for chunk in el.edge_chunks(path, chunk_lines): ids = np.union1d(ids, chunk)
+	np.save(array_path(directory, "ids"), ids)
+	n = len(ids)
+
+	degree = np.zeros(n, dtype=np.int64)
+	for chunk in el.edge_chunks(path, chunk_lines): degree += np.bincount(np.searchsorted(ids, chunk).ravel(), minlength=n)
+	indptr = create_array(directory, "indptr", np.int64, (n+1,))
+	indptr[0] = 0
+	np.cumsum(degree, out=indptr[1:])
+	del degree
+
+	indices = create_array(directory, "indices", np.int32, (int(indptr[-1]),))
+	cursor = np.array(indptr[:-1]) # next free position in the row of every vertex
+	for chunk in el.edge_chunks(path, chunk_lines):
+		edges = np.searchsorted(ids, chunk)
+		source = np.concatenate([edges[:, 0], edges[:, 1]]) # both directions, like engine.edges_to_csr
+		target = np.concatenate([edges[:, 1], edges[:, 0]])
+		order = np.argsort(source, kind="stable")
+		source, target = source[order], target[order]
+		rows, first, counts = np.unique(source, return_index=True, return_counts=True)
+		indices[cursor[source] + np.arange(len(source)) - np.repeat(first, counts)] = target
+		cursor[rows] += counts
+	del cursor
+	sort_rows(indptr, indices)
+	indptr.flush()
+	indices.flush()
+	del indptr, indices
+	write_graph_header(directory, {"stamp": el.source_stamp(path).tolist(), "vertices": n, "fingerprint": disk_fingerprint(directory)})
+
+#------------------------------------------------------------------------------#
+# The CSR on disk of the edge list at path, converted only when the file changed since the last conversion
+def load_graph(path, directory, chunk_lines=el.CHUNK_LINES):
+	header = read_graph_header(directory)
+	if header is None or header.get("stamp") != el.source_stamp(path).tolist(): convert_edgelist(path, directory, chunk_lines)
+	return open_graph(directory)
+
+#*******************************************************************************
+
+# Roots of the vertices x, the vertices found on the way are pointed straight at their root
+def find(parent, x):
+	root = parent[x]
+	while True:
+		up = parent[root]
+		if np.array_equal(up, root): break
+		root = up
+	parent[x] = root
+	return root
+
+#------------------------------------------------------------------------------#
+# Join the trees of u[i] and v[i] for every i, the root with the higher index hangs below the other
+def union(parent, u, v):
+	while len(u):
+		root_u, root_v = find(parent, u), find(parent, v)
+		differ = root_u != root_v
+		u, v, root_u, root_v = u[differ], v[differ], root_u[differ], root_v[differ]
+		parent[np.maximum(root_u, root_v)] = np.minimum(root_u, root_v) # on equal roots one write wins, the loop repeats the rest
+
+#------------------------------------------------------------------------------#
+# Component label (its smallest vertex) of every vertex, the union-find parent array lives on disk next to the CSR
+def components(graph):
+	indptr, indices = graph["indptr"], graph["indices"]
+	n = len(indptr)-1
+	parent = create_array(graph["directory"], "components", np.int32, (n,))
+	for start in range(0, n, ROW_BLOCK): parent[start:start+ROW_BLOCK] = np.arange(start, min(start+ROW_BLOCK, n))
+	for start, end in engine.vertex_blocks(indptr, ROW_BLOCK):
+		owner = np.repeat(np.arange(start, end, dtype=np.int32), np.diff(indptr[start:end+1]))
+		target = np.asarray(indices[indptr[start]:indptr[end]])
+		once = owner < target # every undirected edge is in two rows
+		union(parent, owner[once], target[once])
+	for start in range(0, n, ROW_BLOCK): find(parent, np.arange(start, min(start+ROW_BLOCK, n)))
+	parent.flush()
+	return parent
+
+#------------------------------------------------------------------------------#
+# The largest connected component as another CSR on disk (in LCC_FOLDER), written row block by row block
+def largest_component(graph):
+	directory = os.path.join(graph["directory"], LCC_FOLDER)
+	header = read_graph_header(directory)
+	if header is not None and header.get("source") == graph["fingerprint"]: return open_graph(directory)
+	labels = components(graph)
+	indptr, indices = graph["indptr"], graph["indices"]
+	n = len(indptr)-1
+	sizes = np.bincount(labels, minlength=n)
+	kept = np.asarray(labels) == np.argmax(sizes)
+	del labels
+	if kept.all(): return graph
+	os.makedirs(directory, exist_ok=True)
+	if header is not None: os.remove(os.path.join(directory, GRAPH_FILE))
+	np.save(array_path(directory, "ids"), np.asarray(graph["ids"])[kept])
+	position = np.cumsum(kept) - 1 # new index of every kept vertex, its neighbours are all kept too
+	degree = np.diff(indptr)
+	out_indptr = create_array(directory, "indptr", np.int64, (int(kept.sum())+1,))
+	out_indptr[0] = 0
+	np.cumsum(degree[kept], out=out_indptr[1:])
+	out_indices = create_array(directory, "indices", np.int32, (int(out_indptr[-1]),))
+	offset = 0
+	for start, end in engine.vertex_blocks(indptr, ROW_BLOCK):
+		rows = np.repeat(kept[start:end], degree[start:end])
+		block = position[np.asarray(indices[indptr[start]:indptr[end]])[rows]] # the order of the rows and inside them is kept
+		out_indices[offset:offset+len(block)] = block
+		offset += len(block)
+	out_indptr.flush()
+	out_indices.flush()
+	del out_indptr, out_indices
+	print(f"Largest component: {int(kept.sum())} of {n} vertices")
+	write_graph_header(directory, {"source": graph["fingerprint"], "vertices": int(kept.sum()), "fingerprint": disk_fingerprint(directory)})
+	return open_graph(directory)
+
+#*******************************************************************************
+
+# Landmarks (vertex indices) of the methods that run on the CSR alone
+def select_landmarks(graph, method, num_landmarks, seed=None, budget=None, rows=None):
+	indptr, indices = graph["indptr"], graph["indices"]
+	n = len(indptr)-1
+	if method == 'D': return sorted(centrality.top_k(np.diff(indptr), num_landmarks).tolist()) # Degree
+	elif method == 'R': return (random if seed is None else random.Random(seed)).sample(range(n), num_landmarks) # Random
+	elif method == 'DP': return engine.degree_partitioned(indptr, indices, np.diff(indptr), num_landmarks, budget) # Degree-partitioned
+	elif method == 'FP': return engine.farthest_points(indptr, indices, num_landmarks, budget, rows, dtype=ms.DEFAULT_DTYPE) # Farthest-point
+	raise ValueError(f"Method {method} is not available out-of-core, use one of {METHODS}")
+
+#------------------------------------------------------------------------------#
+# Landmark matrix over nodes (vertex indices, all vertices if None) built from the memory mapped CSR, the pool
+# workers map the same files instead of getting a copy of the graph
+def build_matrix(graph, landmarks, path, method, nodes=None, dtype=ms.DEFAULT_DTYPE, processes=None, progress=None):
+	indptr, indices = graph["indptr"], graph["indices"]
+	columns = None if nodes is None else np.asarray(nodes, dtype=np.int64)
+	ids = idmap.IdMap(np.asarray(graph["ids"]).astype(str))
+	matrix = ms.create_matrix(path, landmarks, np.arange(len(indptr)-1) if nodes is None else nodes, method, graph["fingerprint"], dtype, ids=ids)
+	del matrix # the rows are filled by the engine
+	engine.fill_landmark_rows(indptr, indices, [(path+ms.DATA_SUFFIX, np.asarray(landmarks, dtype=np.int64), columns)],
+							  dtype=dtype, processes=processes, progress=progress)
+
+#*******************************************************************************
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Build a landmark matrix of a graph that does not fit in memory")
+	parser.add_argument("network", help="KONECT edge list")
+	parser.add_argument("directory", help="folder for the CSR on disk")
+	parser.add_argument("matrix", help="matrix path without suffix")
+	parser.add_argument("--method", default="D", choices=METHODS)
+	parser.add_argument("--landmarks", type=int, default=100)
+	parser.add_argument("--dtype", default=np.dtype(ms.DEFAULT_DTYPE).name, choices=[np.dtype(ms.DEFAULT_DTYPE).name, np.dtype(ms.COMPACT_DTYPE).name])
+	parser.add_argument("--budget", type=float, default=None, help="time budget in seconds of DP and FP")
+	parser.add_argument("--processes", type=int, default=None)
+	parser.add_argument("--seed", type=int, default=42)
+	args = parser.parse_args()
+
+	graph = largest_component(load_graph(args.network, args.directory))
+	landmarks = select_landmarks(graph, args.method, args.landmarks, seed=args.seed, budget=args.budget)
+	build_matrix(graph, landmarks, args.matrix, args.method, dtype=args.dtype, processes=args.processes,
+				 progress=lambda done, total: print(f"\r{done}/{total} landmarks", end="", flush=True))
+	print(f"\nLandmark matrix is stored as {args.matrix}")
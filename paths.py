@@ -0,0 +1,87 @@
+import time
+import numpy as np
+import matrixstore as ms # binary landmark matrices
+import engine # CSR adjacency
+import idmap # external IDs <-> vertex indices
+import ifunctions as f # functions with igraph
+
+# Approximate shortest paths through landmarks. A matrix built with calc_landmark_matrix(..., parents=True) also holds
+# the BFS tree of every landmark, so a path from u to v can be read off through the landmark with the smallest
+# d(l,u)+d(l,v): walk up the tree from u and from v and join the two walks where they meet. With the graph given,
+# an optional shortcut pass jumps ahead whenever a later vertex of the path is a neighbour of the current one.
+
+#*******************************************************************************
+
+class LandmarkPaths:
+	def __init__(self, path, numLandmarks=None, G=None):
+		self.matrix, self.header = ms.open_matrix(path)
+		if not ms.parents_exist(path): raise ValueError(f"{path} has no BFS trees, build it with parents=True")
+		self.parents = ms.open_parents(path)
+		self.numLandmarks = self.matrix.shape[0] if numLandmarks is None else min(numLandmarks, self.matrix.shape[0])
+		self.unreachable = ms.unreachable_value(self.matrix.dtype)
+		self.vertices = idmap.IdMap(np.asarray(self.header["vertices"]).astype(str)) # external ID <-> vertex index
+		self.columns = ms.node_index(self.header) # vertex index -> matrix column
+		self.csr = None if G is None else engine.graph_to_csr(G)
+
+	#------------------------------------------------------------------------------#
+	# Vertices from vertex up to the root of the BFS tree of landmark row
+	def walk(self, row, vertex):
+		parents = self.parents[row]
+		walk = [vertex]
+		while parents[walk[-1]] >= 0: walk.append(int(parents[walk[-1]]))
+		return walk
+
+	#------------------------------------------------------------------------------#
+	# Skip ahead to the last vertex of the path that is a neighbour of the current one
+	def shortcut(self, path):
+		indptr, indices = self.csr
+		position = {vertex: i for i, vertex in enumerate(path)}
+		short, i = [path[0]], 0
+		while i < len(path)-1:
+			reach = [position[x] for x in indices[indptr[path[i]]:indptr[path[i]+1]].tolist() if position.get(x, -1) > i]
+			i = max(reach, default=i+1)
+			short.append(path[i])
+		return short
+
+	#------------------------------------------------------------------------------#
+	# Path between the vertices s and t as a list of vertex indices through the best landmark, None if they are not connected
+	def vertex_path(self, s, t, shortcut=True):
+		column_s, column_t = self.columns.to_index([s, t])
+		dist_s = self.matrix[:self.numLandmarks, column_s].astype(np.float64) # weighted matrices hold uint32 or float32
+		dist_t = self.matrix[:self.numLandmarks, column_t].astype(np.float64)
+		dist_st = np.where((dist_s == self.unreachable) | (dist_t == self.unreachable), np.inf, dist_s + dist_t)
+		if len(dist_st) == 0 or dist_st.min() == np.inf: return None
+		row = int(np.argmin(dist_st))
+		walk_s, walk_t = self.walk(row, int(s)), self.walk(row, int(t))
+		on_t = {vertex: i for i, vertex in enumerate(walk_t)}
+		meet = next(i for i, vertex in enumerate(walk_s) if vertex in on_t) # the walks share at least the landmark
+		path = walk_s[:meet+1] + walk_t[:on_t[walk_s[meet]]][::-1]
+		if shortcut and self.csr is not None: path = self.shortcut(path)
+		return path
+
+	#------------------------------------------------------------------------------#
+	# Path from u to v (external IDs) as a list of external IDs, None if they are not connected
+	def path(self, u, v, shortcut=True):
+		s, t = self.vertices.to_index([str(u), str(v)])
+		path = self.vertex_path(s, t, shortcut)
+		return None if path is None else self.vertices.to_id(path).tolist()
+
+#*******************************************************************************
+
+# Compare the landmark paths with G.get_shortest_paths for every pair: path length stretch and queries per second
+def compare_with_igraph(G, paths, pairs, shortcut=True):
+	vertex_pairs = f.vertex_indices(pairs).reshape(-1, 2)
+	tik = time.perf_counter()
+	exact = [len(G.get_shortest_paths(int(s), to=int(t))[0]) - 1 for s, t in vertex_pairs]
+	igraph_seconds = time.perf_counter() - tik
+	tik = time.perf_counter()
+	found = [paths.vertex_path(s, t, shortcut) for s, t in vertex_pairs]
+	landmark_seconds = time.perf_counter() - tik
+	lengths = np.array([np.inf if p is None else len(p) - 1 for p in found], dtype=np.float64)
+	exact = np.asarray(exact, dtype=np.float64)
+	connected = exact > 0
+	stretch = lengths[connected] / exact[connected]
+	return {"mean_stretch": float(stretch.mean()) if stretch.size else float("nan"),
+			"exact_share": float((lengths[connected] == exact[connected]).mean()) if stretch.size else float("nan"),
+			"landmark_queries_per_s": len(pairs) / max(landmark_seconds, 1e-9),
+			"igraph_queries_per_s": len(pairs) / max(igraph_seconds, 1e-9)}
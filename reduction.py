@@ -0,0 +1,162 @@
+import time
+import numpy as np
+import engine # CSR adjacency and BFS
+
+# Graph reduction before the landmark work. Two kinds of vertices add nothing to the distances:
+#   leaves: a vertex of degree 1 hangs from its only neighbour, d(v,x) = 1 + d(parent,x) for every other x, peeling
+#           leaves repeatedly removes whole trees (the depth of a vertex is its number of leaf steps to the core)
+#   twins:  vertices with the same neighbours (open twins, 2 apart) or the same neighbours including themselves
+#           (closed twins, adjacent) have the same distance to every other vertex, the one with the lowest index stays
+# Removing either kind keeps the distances between the remaining vertices, so both are repeated until nothing changes
+# and the selection, matrix and distance work runs on the remaining core. A query between removed vertices is
+# translated exactly: the endpoint that was removed first steps to its parent (+1) or its twin until both endpoints
+# are core vertices (d = steps + d_core) or they meet.
+CORE, LEAF, OPEN_TWIN, CLOSED_TWIN = 0, 1, 2, 3
+TWIN_DISTANCE = np.array([0, 0, 2, 1]) # distance between a twin and the twin it was contracted into, per kind
+KEPT = np.iinfo(np.int64).max # removal step of the core vertices
+
+#*******************************************************************************
+
+# The neighbours of vertices that are still alive, as (owner, neighbour) arrays in the order of vertices
+def alive_neighbours(indptr, indices, alive, vertices):
+	degree = indptr[vertices+1] - indptr[vertices]
+	owner = np.repeat(vertices, degree)
+	neighbour = engine.neighbours(indptr, indices, vertices).astype(np.int64)
+	keep = alive[neighbour]
+	return owner[keep], neighbour[keep]
+
+#------------------------------------------------------------------------------#
+# Remove degree 1 vertices until there are none, returns the next step and the number of removed vertices
+def peel_leaves(indptr, indices, alive, degree, reduction, step):
+	removed = 0
+	while True:
+		leaves = np.flatnonzero(alive & (degree == 1))
+		if leaves.size == 0: return step, removed
+		_, parent = alive_neighbours(indptr, indices, alive, leaves) # exactly one per leaf
+		peel = ~((degree[parent] == 1) & (leaves < parent)) # of two leaves joined by an edge the lower one stays
+		leaves, parent = leaves[peel], parent[peel]
+		alive[leaves] = False
+		np.subtract.at(degree, parent, 1)
+		degree[leaves] = 0
+		reduction["kind"][leaves], reduction["target"][leaves], reduction["step"][leaves] = LEAF, parent, step
+		step += 1
+		removed += len(leaves)
+
+#------------------------------------------------------------------------------#
+# Contract open (closed=False) or closed twins into the lowest index of their class, returns the next step and the
+# number of removed vertices. Classes are found by a random hash of the neighbour set and checked exactly
+def contract_twins(indptr, indices, alive, degree, reduction, step, weights, closed):
+	vertices = np.flatnonzero(alive & (degree >= 2)) # twins of degree 1 are leaves
+	if vertices.size < 2: return step, 0
+	owner, neighbour = alive_neighbours(indptr, indices, alive, vertices)
+	signature = np.zeros(len(alive), dtype=np.uint64)
+	np.add.at(signature, owner, weights[neighbour]) # wraps around, the sum is only a hash
+	if closed: signature[vertices] += weights[vertices]
+	order = vertices[np.lexsort((vertices, signature[vertices], degree[vertices]))]
+	key = np.stack([degree[order], signature[order].view(np.int64)], axis=1)
+	starts = np.flatnonzero(np.r_[True, (key[1:] != key[:-1]).any(axis=1)])
+	twins, targets = [], []
+	for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+		if end - start < 2: continue
+		members = order[start:end]
+		sets = [set(indices[indptr[v]:indptr[v+1]][alive[indices[indptr[v]:indptr[v+1]]]].tolist()) | ({int(v)} if closed else set()) for v in members]
+		for member, neighbours in zip(members[1:], sets[1:]):
+			if neighbours == sets[0]:
+				twins.append(member)
+				targets.append(members[0])
+	if not twins: return step, 0
+	twins = np.asarray(twins, dtype=np.int64)
+	_, neighbour = alive_neighbours(indptr, indices, alive, twins)
+	alive[twins] = False
+	np.subtract.at(degree, neighbour, 1)
+	degree[twins] = 0
+	reduction["kind"][twins] = CLOSED_TWIN if closed else OPEN_TWIN
+	reduction["target"][twins], reduction["step"][twins] = targets, step
+	return step + 1, len(twins)
+
+#*******************************************************************************
+
+# Leaves and twins keep the distances only with unit weights in both directions
+def reducible(G):
+	return not G.is_directed() and "weight" not in G.es.attributes()
+
+#------------------------------------------------------------------------------#
+# Reduce G to its core, returns a dict with per vertex its kind, target (parent or twin), removal step, anchor (the core
+# vertex it resolves to) and depth (its leaf steps to the anchor), the core vertices and their index in the core graph
+def reduce_graph(G, seed=0):
+	n = G.vcount()
+	edges = np.asarray(engine.graph_edges(G), dtype=np.int64)
+	edges = np.unique(np.sort(edges[edges[:, 0] != edges[:, 1]], axis=1), axis=0) # simple graph: no loops or multi-edges
+	indptr, indices = engine.edges_to_csr(edges, n)
+	alive = np.ones(n, dtype=bool)
+	degree = np.diff(indptr)
+	reduction = {"kind": np.full(n, CORE, dtype=np.int8), "target": np.arange(n, dtype=np.int64), "step": np.full(n, KEPT, dtype=np.int64)}
+	weights = np.random.default_rng(seed).integers(0, np.iinfo(np.uint64).max, size=n, dtype=np.uint64, endpoint=True)
+	step = 0
+	while True:
+		step, leaves = peel_leaves(indptr, indices, alive, degree, reduction, step)
+		step, open_twins = contract_twins(indptr, indices, alive, degree, reduction, step, weights, closed=False)
+		step, closed_twins = contract_twins(indptr, indices, alive, degree, reduction, step, weights, closed=True)
+		if not (leaves or open_twins or closed_twins): break
+	reduction["core"] = np.flatnonzero(alive)
+	reduction["core_index"] = np.full(n, -1, dtype=np.int64)
+	reduction["core_index"][reduction["core"]] = np.arange(len(reduction["core"]))
+	anchor, depth = np.arange(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+	while True: # follow the targets until every vertex is at the core
+		moving = reduction["step"][anchor] != KEPT
+		if not moving.any(): break
+		depth[moving] += reduction["kind"][anchor[moving]] == LEAF
+		anchor[moving] = reduction["target"][anchor[moving]]
+	reduction["anchor"], reduction["depth"] = anchor, depth
+	return reduction
+
+#------------------------------------------------------------------------------#
+# The core as an igraph graph, core vertex i is reduction["core"][i] of G (names are kept)
+def core_graph(G, reduction):
+	return G.induced_subgraph(reduction["core"].tolist())
+
+#------------------------------------------------------------------------------#
+# Translate pairs of vertex indices of G into pairs of core indices, returns the core pairs, the distance to add and
+# whether the pair is already solved (then the distance to add is the distance and the core pair is a dummy (c, c))
+def translate_pairs(reduction, pairs):
+	pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+	u, v = pairs[:, 0].copy(), pairs[:, 1].copy()
+	kind, target, step = reduction["kind"], reduction["target"], reduction["step"]
+	extra = np.zeros(len(pairs), dtype=np.int64)
+	while True:
+		active = np.flatnonzero((u != v) & ((step[u] != KEPT) | (step[v] != KEPT)))
+		if active.size == 0: break
+		first = step[u[active]] <= step[v[active]] # the endpoint removed first steps, the other was still there at that time
+		moved = np.where(first, u[active], v[active])
+		other = np.where(first, v[active], u[active])
+		reached = (kind[moved] != LEAF) & (target[moved] == other) # a twin and its target: their distance, not 0
+		extra[active] += np.where(kind[moved] == LEAF, 1, np.where(reached, TWIN_DISTANCE[kind[moved]], 0))
+		u[active] = np.where(first, target[moved], u[active])
+		v[active] = np.where(first, v[active], target[moved])
+	solved = u == v
+	return np.stack([reduction["core_index"][u], reduction["core_index"][v]], axis=1), extra, solved
+
+#------------------------------------------------------------------------------#
+# Distances of the original pairs from the distances of their core pairs (inf stays inf)
+def expand_distances(core_distances, extra, solved):
+	return np.where(solved, extra, np.asarray(core_distances, dtype=np.float64) + extra)
+
+#*******************************************************************************
+
+# Size of the reduction and the speedup of one batch of BFS searches on the core compared to the whole graph
+def reduction_report(G, core, reduction, seed=0):
+	kind = reduction["kind"]
+	report = {"vertices": G.vcount(), "edges": G.ecount(), "core_vertices": core.vcount(), "core_edges": core.ecount(),
+			  "vertex_ratio": core.vcount() / max(G.vcount(), 1), "edge_ratio": core.ecount() / max(G.ecount(), 1),
+			  "leaves": int((kind == LEAF).sum()), "open_twins": int((kind == OPEN_TWIN).sum()),
+			  "closed_twins": int((kind == CLOSED_TWIN).sum()), "max_depth": int(reduction["depth"].max(initial=0))}
+	rng = np.random.default_rng(seed)
+	seconds = []
+	for graph in (G, core):
+		indptr, indices = engine.graph_to_csr(graph)
+		sources = rng.choice(graph.vcount(), size=min(engine.BATCH_SIZE, graph.vcount()), replace=False)
+		tik = time.perf_counter()
+		engine.multi_source_bfs(indptr, indices, sources)
+		seconds.append(time.perf_counter() - tik)
+	report["bfs_speedup"] = seconds[0] / max(seconds[1], 1e-9)
+	return report
@@ -0,0 +1,332 @@
+import argparse
+import functools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import statistics as stat # statistics about a network
+import ifunctions as f # functions with igraph
+import matrixstore as ms # binary landmark matrices
+import cache # cached landmark selections and matrices
+import evaluation as ev # accuracy against cost
+import reduction as rd # degree-1 peeling and twin contraction
+
+# Non-interactive pipeline runner. A run is described by a config dict with the settings of snacs.py and goes through
+# the stages load -> statistics -> select -> pairs -> matrix + real distances -> estimate -> plot. The result of every
+# stage is recorded in <data_path>/checkpoints.json, a run that is started again skips the stages that are done and
+# an interrupted matrix build continues with its missing rows. The matrix build and the real distances do not depend
+# on each other and run at the same time. Several graphs can be run as one sweep over a pool of worker processes:
+#   python runner.py config.json            config holds settings and optionally "graphs": [{"network_path", "graph_name"}]
+#   python runner.py --networks Networks    one graph per KONECT url in the file, read from networks/out.<name>
+SETTINGS = ["size", "network_path", "graph_name", "data_path", "landmark_range", "method_names", "landmark_selection_methods",
+			"numPairs", "saveSpace", "randomseed", "processes", "cache_dir", "exact_search", "selection_budget", "GraphStatistics",
+			"matrix_dtype", "compress_matrices", "store_parents", "reduce_graph"]
+CHECKPOINT_FILE = "checkpoints.json"
+
+#*******************************************************************************
+def create_folder(path):
+	if not os.path.exists(path): # Check if the path exists
+		os.makedirs(path) # If it doesn't exist, create the folders
+		print(f"Path '{path}' created.")
+	else: print(f"Path '{path}' already exists. Finished stages are reused!")
+#*******************************************************************************
+def writeClock(process, time, file_path):
+	# Open the file in append mode (a+ creates the file if it doesn't exist)
+	with open(file_path+"Timer.txt", 'a+') as file: # Write lines with variables a and b
+		file.write(f'{process}: {time}\n')
+#*******************************************************************************
+def load_checkpoint(data_path):
+	if not os.path.exists(data_path+CHECKPOINT_FILE): return {}
+	with open(data_path+CHECKPOINT_FILE, 'r') as file:
+		return json.load(file)
+#------------------------------------------------------------------------------#
+def save_checkpoint(data_path, checkpoint):
+	with open(data_path+CHECKPOINT_FILE+".tmp", 'w') as file:
+		json.dump(checkpoint, file)
+	os.replace(data_path+CHECKPOINT_FILE+".tmp", data_path+CHECKPOINT_FILE) # never leave a half written checkpoint behind
+#*******************************************************************************
+# Method name used in the cache, a budget can cut a scalable selection short so it is part of the key
+# PageRank and closeness come from centrality.py (power iteration, sampled pivots), not from the exact igraph scores
+def selection_key(config, method):
+	key = f"{method}:approx" if method in ("PR", "C") else method
+	if method in ("SB", "DP", "FP", "PR", "C") and config["selection_budget"] is not None: key += f":{config['selection_budget']}s"
+	return key
+#------------------------------------------------------------------------------#
+# Method name used for a matrix in the cache, a matrix with another storage type or with BFS trees is another entry
+def matrix_key(config, method):
+	key = selection_key(config, method)
+	if np.dtype(config["matrix_dtype"]) != np.dtype(ms.DEFAULT_DTYPE): key += f":{config['matrix_dtype']}"
+	if config["store_parents"]: key += ":parents"
+	return key
+#*******************************************************************************
+# Initialise
+def init(config):
+	"""create graph and if needed find largest connected component"""
+	if config["network_path"] == "generate":
+		print(f"Generating graph {config['graph_name']}...", end="", flush=True)
+		G = f.create_smallworld_graph(config["size"])
+	else:
+		print(f"Reading graph {config['network_path']}...", end="", flush=True)
+		G = f.read_graph_file(config["network_path"])
+		G = f.largest_cc(G)
+	print("done")
+	return G
+
+#------------------------------------------------------------------------------#
+# Reduce the graph to its core (reduction.py), the report is stored as <graph_name>_reduction.json
+def reduce_stage(config, G):
+	print("\033[94m\nReducing the graph\033[0m")
+	tik = time.time()
+	reduction = rd.reduce_graph(G, seed=config["randomseed"])
+	core = rd.core_graph(G, reduction)
+	tok = time.time()
+	report = rd.reduction_report(G, core, reduction, seed=config["randomseed"])
+	writeClock("Reducing the graph", tok-tik, config["data_path"])
+	with open(f"{config['data_path']}{config['graph_name']}_reduction.json", 'w') as file:
+		json.dump(report, file, indent=1)
+	print(f"Core has {report['vertex_ratio']:.1%} of the vertices and {report['edge_ratio']:.1%} of the edges "
+		  f"({report['leaves']} leaves, {report['open_twins']+report['closed_twins']} twins removed), BFS speedup {report['bfs_speedup']:.2f}x")
+	return core, reduction
+
+#*******************************************************************************
+
+# Selecting landmarks for each method (or reuse them from the cache), returns the landmarks and the BFS rows of a
+# farthest-point selection that the matrix build can reuse
+def select_stage(config, G, fingerprint):
+	Landmarks, selection_rows = {}, {}
+	numLandmarks = max(config["landmark_range"])
+	cache_dir, seed, budget = config["cache_dir"], config["randomseed"], config["selection_budget"]
+	score_cache = f.ScoreCache(G, budget=budget, seed=seed, processes=config["processes"]) # degree once for D and DP
+	print("\033[94m\nSelecting landmarks with different methods\033[0m")
+	for method in config["landmark_selection_methods"]:
+		print(f"Selecting landmarks with method {config['method_names'][method]}...", end="", flush=True)
+		tik = time.time()
+		cached = cache.load_selection(cache_dir, fingerprint, selection_key(config, method), numLandmarks, seed)
+		if cached is None:
+			scores = score_cache.get(method)
+			if method == 'FP': selection_rows[method] = [] # the BFS rows of the selection are reused for the matrix
+			Landmarks[method] = f.LandmarkSelection(G, method, numLandmarks, scores=scores, seed=seed, budget=budget, rows=selection_rows.get(method))
+			cache.store_selection(cache_dir, fingerprint, selection_key(config, method), seed, Landmarks[method], scores)
+		else:
+			Landmarks[method], scores = cached
+			score_cache.put(method, scores)
+			if scores is not None: Landmarks[method] = f.LandmarkSelection(G, method, numLandmarks, scores=scores, budget=budget) # cheap, also exact when a larger selection is cached
+		tok = time.time()
+		writeClock(f"Selecting landmarks. Method: {method}{' (cached)' if cached else ''}", tok-tik, config["data_path"])
+		print("done" if cached is None else "done (cached)")
+	return {method: np.asarray(Landmarks[method]).tolist() for method in Landmarks}, selection_rows
+
+#------------------------------------------------------------------------------#
+# Creating landmark matrices (or reuse them from the cache), an interrupted build continues with its missing rows
+def matrix_stage(config, G, fingerprint, Landmarks, columns, selection_rows):
+	cache_dir, seed, method_names = config["cache_dir"], config["randomseed"], config["method_names"]
+	print("\033[94m\nCalculating landmark matrices\033[0m")
+	matrix_paths, build = {}, [] # methods whose matrix is not cached are built together
+	for method in config["landmark_selection_methods"]:
+		matrix_paths[method] = cache.lookup_matrix(cache_dir, fingerprint, matrix_key(config, method), seed, Landmarks[method], columns)
+		if matrix_paths[method] is None:
+			matrix_paths[method] = cache.matrix_path(cache_dir, fingerprint, matrix_key(config, method), seed, Landmarks[method], columns)
+			build.append(method)
+		else: print(f"{method_names[method]} matrix is cached")
+	if build:
+		tik = time.time()
+		f.calc_landmark_matrices(G,
+								 {method_names[method]: Landmarks[method] for method in build},
+								 {method_names[method]: matrix_paths[method] for method in build},
+								 [method_names[method] for method in build],
+								 nodes = columns,
+								 processes = config["processes"],
+								 fingerprint = fingerprint,
+								 known_rows = {method_names[method]: selection_rows[method] for method in build if method in selection_rows},
+								 resume = True,
+								 dtype = np.dtype(config["matrix_dtype"]),
+								 parents = config["store_parents"])
+		tok = time.time()
+		writeClock(f"Calculating landmark matrices. Methods: {build}", tok-tik, config["data_path"])
+		for method in build:
+			if config["compress_matrices"]:
+				ms.compress_matrix(matrix_paths[method])
+				if ms.matrix_exists(ms.backward_path(matrix_paths[method])): ms.compress_matrix(ms.backward_path(matrix_paths[method]))
+			cache.register_matrix(cache_dir, fingerprint, matrix_key(config, method), seed, Landmarks[method], columns)
+	return matrix_paths
+
+#------------------------------------------------------------------------------#
+# Calculating the real shortest paths between the pairs
+def real_stage(config, G, pairs):
+	print("\033[94m\nCalculating real shortest paths\033[0m")
+	tik = time.time()
+	real_distances = f.CalcAndStoreRealDist(G, pairs, config["data_path"], config["graph_name"], processes=config["processes"])
+	tok = time.time()
+	writeClock("Calculating real distances", tok-tik, config["data_path"])
+	return real_distances
+
+#------------------------------------------------------------------------------#
+# Calculating shortest paths estimation using the landmarks, the estimates of every method are stored as
+# <graph_name>_estimates_<method>.npy (landmark counts x pairs), the measured query costs go into the checkpoint
+def estimate_stage(config, G, pairs, matrix_paths, checkpoint):
+	data_path, landmark_range = config["data_path"], config["landmark_range"]
+	estimates, costs = {}, {}
+	print("\033[94m\nCalculating estimated shortest paths\033[0m")
+	for method in config["landmark_selection_methods"]:
+		path = f"{data_path}{config['graph_name']}_estimates_{method}.npy"
+		if method in checkpoint.get("estimate", {}) and method in checkpoint.get("costs", {}) and os.path.exists(path):
+			estimates[method] = dict(zip(landmark_range, np.load(path)))
+			costs[method] = dict(zip(landmark_range, checkpoint["costs"][method]))
+			continue
+		matrix, header = ms.open_matrix(matrix_paths[method]) # memory mapped, rows are paged in when used
+		backward, _ = ms.open_backward(matrix_paths[method]) # distances towards the landmarks, only for a directed graph
+		node_index = ms.node_index(header)
+
+		print(f"{config['method_names'][method]}...", end="", flush=True)
+		tik = time.time()
+		estimates[method] = f.CalcEstimateDistRange(matrix, node_index, pairs, landmark_range, backward=backward) # all landmark counts in one pass
+		tok = time.time()
+		writeClock(f"Estimating distances. Method: {method}, NumLandmarks: {landmark_range}", tok-tik, data_path)
+		np.save(path, np.stack([estimates[method][numLandmarks] for numLandmarks in landmark_range]))
+		costs[method] = ev.query_costs(functools.partial(f.CalcEstimateDist, backward=backward), matrix, node_index, pairs, landmark_range)
+		print("done")
+
+		if config["exact_search"] and backward is None and f.edge_weights(G) is None: # the ALT search is unit weight and undirected
+			tik = time.time()
+			exact, expanded = f.CalcExactDistALT(G, matrix, node_index, pairs, max(landmark_range))
+			tok = time.time()
+			writeClock(f"Exact distances (ALT). Method: {method}, mean nodes expanded: {expanded.mean():.1f}", tok-tik, data_path)
+		del matrix, backward
+		checkpoint.setdefault("estimate", {})[method] = path
+		checkpoint.setdefault("costs", {})[method] = [costs[method][numLandmarks] for numLandmarks in landmark_range]
+		save_checkpoint(data_path, checkpoint)
+	return estimates, costs
+
+#------------------------------------------------------------------------------#
+# Calculate the per pair losses between estimate distances and real distances (ev.evaluate), store them per method,
+# landmark count and distance bucket, and make a losses plot for different methods with on the x-axis different num
+# landmarks next to the Pareto plot of loss against query time
+def plot_stage(config, estimates, costs, real_distances):
+	print("\033[94m\nCalculating losses\033[0m")
+	methods, landmark_range = config["landmark_selection_methods"], config["landmark_range"]
+	records = {method: ev.evaluate(config["method_names"][method], estimates[method], real_distances, landmark_range, costs[method])
+			   for method in methods}
+	ev.write_evaluation([record for method in methods for record in records[method]], config["data_path"]+config["graph_name"])
+	losses = [[record["mean_error"] for record in records[method] if record["bucket"] == "all"] for method in methods]
+	print("done")
+	print("\033[94m\nProducing losses-plot\033[0m")
+	f.combined_loss_plot_methods(losses,
+								 config["landmark_range"],
+								 [config["method_names"][i] for i in methods],
+								 "landmarks",
+								 path = config["data_path"]+config["graph_name"],
+								 costs = [[costs[method][numLandmarks]["query_us"] for numLandmarks in landmark_range] for method in methods])
+
+#*******************************************************************************
+
+# Run the pipeline of one graph, stages recorded in the checkpoint are not run again
+def run(config):
+	data_path = config["data_path"]
+	create_folder(data_path) # Prepare data folder
+	checkpoint = load_checkpoint(data_path)
+	def done(stage, value=True):
+		checkpoint[stage] = value
+		save_checkpoint(data_path, checkpoint)
+
+	G = init(config) # Initialise graph
+	fingerprint = f.graph_fingerprint(G)
+	settings = {name: config[name] for name in ("landmark_range", "landmark_selection_methods", "numPairs", "saveSpace", "randomseed", "selection_budget", "reduce_graph", "matrix_dtype")}
+	if checkpoint.get("fingerprint") != fingerprint or checkpoint.get("settings") != settings or checkpoint.get("version") != cache.VERSION: # the graph or the experiment changed, start over
+		checkpoint = {"fingerprint": fingerprint, "settings": settings, "version": cache.VERSION}
+	writeClock(f"=================== {config['graph_name']} ==================", "", data_path)
+
+	# Get statistics about graph, only required once per dataset and is time expensive
+	if config["GraphStatistics"] and "statistics" not in checkpoint:
+		stat.GetStatistics(G, data_path, name=config["graph_name"])
+		done("statistics")
+
+	#========================== OFFLINE CALCULATIONS ============================#
+
+	G.cache = True # to avoid redundant calculations
+	# Selection, matrices and distances run on the core, the pairs stay pairs of G and are translated to the core
+	core, reduction = reduce_stage(config, G) if config["reduce_graph"] and rd.reducible(G) else (G, None)
+	core_fingerprint = f.graph_fingerprint(core) if reduction is not None else fingerprint
+	selection_rows = {}
+	if "select" in checkpoint and all(method in checkpoint["select"] for method in config["landmark_selection_methods"]):
+		Landmarks = checkpoint["select"]
+	else:
+		Landmarks, selection_rows = select_stage(config, core, core_fingerprint)
+		done("select", Landmarks)
+
+	# Select X random pairs of nodes for the experiment
+	if "pairs" in checkpoint: pairs = [tuple(pair) for pair in checkpoint["pairs"]]
+	else:
+		print("\033[94m\nSelecting random pairs\033[0m")
+		pairs = f.SelectRandomNodePairs(G, config["numPairs"], config["randomseed"]) # returns a list of tuples (a,b)
+		done("pairs", pairs)
+		print("done")
+	if reduction is not None: core_pairs, extra, solved = rd.translate_pairs(reduction, pairs)
+	else: core_pairs = pairs
+	columns = sorted(set(np.asarray(core_pairs).ravel().tolist())) if config["saveSpace"] else None
+
+	# The landmark matrices and the real distances are independent, they run at the same time
+	real_path = f"{data_path}{config['graph_name']}_real_distances.npy"
+	with ThreadPoolExecutor(2) as pool:
+		matrix_future = pool.submit(matrix_stage, config, core, core_fingerprint, Landmarks, columns, selection_rows)
+		if "real" in checkpoint and os.path.exists(real_path):
+			stored = np.load(real_path)
+			real_distances = np.where(stored == ms.unreachable_value(stored.dtype), np.inf, stored.astype(np.float64))
+		else:
+			real_distances = real_stage(config, core, core_pairs)
+			done("real", real_path)
+		matrix_paths = matrix_future.result()
+	done("matrix", matrix_paths)
+	if reduction is not None: real_distances = rd.expand_distances(real_distances, extra, solved)
+
+	#========================== ONLINE CALCULATIONS =============================#
+
+	estimates, costs = estimate_stage(config, core, core_pairs, matrix_paths, checkpoint)
+	if reduction is not None:
+		estimates = {method: {num: rd.expand_distances(values, extra, solved) for num, values in estimates[method].items()} for method in estimates}
+	plot_stage(config, estimates, costs, real_distances)
+	done("plot")
+	return checkpoint
+
+#*******************************************************************************
+
+# Settings of snacs.py with the values in overrides replaced
+def make_config(overrides):
+	import snacs # settings module, imported here because snacs.main runs through this module
+	config = dict(snacs.settings(), **overrides)
+	if "data_path" not in overrides: config["data_path"] = f"data/{config['graph_name']}/"
+	return config
+
+#------------------------------------------------------------------------------#
+# One graph per KONECT url in a Networks file, the edge list is expected at networks/out.<name>
+def network_graphs(path):
+	graphs = []
+	with open(path, 'r') as file:
+		for url in file.read().split():
+			name = url.rstrip("/").split("/")[-1]
+			if os.path.exists(f"networks/out.{name}"): graphs.append({"network_path": f"networks/out.{name}", "graph_name": name})
+			else: print(f"networks/out.{name} not found, {name} is skipped")
+	return graphs
+
+#------------------------------------------------------------------------------#
+# Run several graphs as one sweep, workers is the number of graphs that run at the same time
+def sweep(configs, workers=None):
+	if len(configs) == 1: return [run(configs[0])]
+	with ProcessPoolExecutor(workers or len(configs)) as pool:
+		return list(pool.map(run, configs))
+
+#*******************************************************************************
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Run the landmark pipeline without prompts, finished stages are skipped")
+	parser.add_argument("config", nargs="?", default=None, help="JSON file with settings (see snacs.py) and optionally a list of graphs")
+	parser.add_argument("--networks", default=None, help="Networks file with KONECT urls to sweep over")
+	parser.add_argument("--workers", type=int, default=None, help="number of graphs that run at the same time")
+	args = parser.parse_args()
+
+	overrides = {}
+	if args.config:
+		with open(args.config, 'r') as file:
+			overrides = json.load(file)
+	graphs = overrides.pop("graphs", None) or (network_graphs(args.networks) if args.networks else [{}])
+	sweep([make_config(dict(overrides, **graph)) for graph in graphs], args.workers)
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import matrixstore as ms # binary landmark matrices
+import idmap # external IDs -> matrix columns
+
+# Query time landmark estimator. A LandmarkEstimator opens a matrix written by calc_landmark_matrix once and
+# answers distance queries between external node IDs. serve() puts a small asyncio front end (TCP or Unix socket)
+# in front of it: every line "u v" is answered with the estimated distance ("inf" if not connected), and the
+# queries that arrive while a batch is being answered are collected and answered with one vectorized lookup.
+MAX_BATCH = 4096
+
+#*******************************************************************************
+
+class LandmarkEstimator:
+	# numLandmarks limits the rows used (all if None). With in_memory the used rows are copied node major into RAM,
+	# so a point query reads two contiguous rows instead of one value per landmark from the memory map
+	def __init__(self, path, numLandmarks=None, in_memory=True):
+		matrix, self.header = ms.open_matrix(path)
+		self.numLandmarks = matrix.shape[0] if numLandmarks is None else min(numLandmarks, matrix.shape[0])
+		rows = matrix[:self.numLandmarks]
+		self.by_node = np.ascontiguousarray(rows.T) if in_memory else rows.T # nodes x landmarks
+		backward, _ = ms.open_backward(path) # a directed graph also has the distances towards the landmarks
+		self.to_landmarks = self.by_node if backward is None else np.ascontiguousarray(backward[:self.numLandmarks].T) if in_memory else backward[:self.numLandmarks].T
+		self.work = np.float64 if matrix.dtype.kind == "f" else np.int64 # weighted matrices hold uint32 or float32
+		self.unreachable = ms.unreachable_value(matrix.dtype)
+		self.ids = idmap.IdMap(np.asarray(self.header["node_ids"]).astype(str)) # external IDs as text, like they arrive over the socket
+
+	#------------------------------------------------------------------------------#
+	# Column of every external node ID, raises KeyError for IDs that are not in the matrix
+	def columns(self, nodes):
+		return self.ids.to_index(np.asarray(nodes).astype(str)).astype(np.int64)
+
+	#------------------------------------------------------------------------------#
+	def known(self, node):
+		return str(node) in self.ids
+
+	#------------------------------------------------------------------------------#
+	# Upper bound min(d(s,l)+d(l,t)) for arrays of columns, inf if no landmark lies on a path from s to t
+	def estimate_columns(self, sources, targets):
+		dist_s = self.to_landmarks[sources].astype(self.work)
+		dist_t = self.by_node[targets].astype(self.work)
+		dist_st = dist_s + dist_t
+		dist_st[(dist_s == self.unreachable) | (dist_t == self.unreachable)] = np.iinfo(np.int64).max if self.work == np.int64 else np.inf
+		best = dist_st.min(axis=1).astype(np.float64) if dist_st.shape[1] else np.full(len(sources), np.inf)
+		best[best == np.iinfo(np.int64).max] = np.inf
+		best[sources == targets] = 0
+		return best
+
+	#------------------------------------------------------------------------------#
+	def estimate_many(self, pairs):
+		if len(pairs) == 0: return np.empty(0, dtype=np.float64)
+		sources = self.columns([s for s, _ in pairs])
+		targets = self.columns([t for _, t in pairs])
+		return self.estimate_columns(sources, targets)
+
+	#------------------------------------------------------------------------------#
+	def estimate(self, u, v):
+		return float(self.estimate_many([(u, v)])[0])
+
+#*******************************************************************************
+
+# Collects the queries of all connections and answers them in batches
+class Batcher:
+	def __init__(self, estimator, max_batch=MAX_BATCH):
+		self.estimator = estimator
+		self.max_batch = max_batch
+		self.queue = asyncio.Queue()
+		self.batches = 0
+
+	#------------------------------------------------------------------------------#
+	async def query(self, u, v):
+		future = asyncio.get_running_loop().create_future()
+		await self.queue.put((u, v, future))
+		return await future
+
+	#------------------------------------------------------------------------------#
+	async def run(self):
+		while True:
+			batch = [await self.queue.get()] # wait for a query, then take everything that queued up meanwhile
+			while len(batch) < self.max_batch and not self.queue.empty(): batch.append(self.queue.get_nowait())
+			self.batches += 1
+			known = [query for query in batch if self.estimator.known(query[0]) and self.estimator.known(query[1])]
+			estimates = self.estimator.estimate_many([(u, v) for u, v, _ in known])
+			for (_, _, future), estimate in zip(known, estimates):
+				if not future.done(): future.set_result(float(estimate))
+			for u, v, future in batch:
+				if not future.done(): future.set_exception(KeyError(v if self.estimator.known(u) else u))
+
+#------------------------------------------------------------------------------#
+async def handle_connection(batcher, reader, writer):
+	try:
+		while line := await reader.readline():
+			parts = line.split()
+			if len(parts) != 2:
+				writer.write(b"error expected: <u> <v>\n")
+				continue
+			try: writer.write(f"{await batcher.query(parts[0].decode(), parts[1].decode())}\n".encode())
+			except KeyError as node: writer.write(f"error unknown node {node}\n".encode())
+			await writer.drain()
+	except ConnectionError: pass
+	finally: writer.close()
+
+#------------------------------------------------------------------------------#
+# Start the front end on a Unix socket (socket_path) or on host:port, returns the server and the batcher task
+async def start_server(estimator, host="127.0.0.1", port=8765, socket_path=None, max_batch=MAX_BATCH):
+	batcher = Batcher(estimator, max_batch)
+	task = asyncio.create_task(batcher.run())
+	handler = lambda reader, writer: handle_connection(batcher, reader, writer)
+	if socket_path is None: server = await asyncio.start_server(handler, host, port)
+	else: server = await asyncio.start_unix_server(handler, socket_path)
+	server.batcher = batcher
+	return server, task
+
+#------------------------------------------------------------------------------#
+async def serve(estimator, host="127.0.0.1", port=8765, socket_path=None, max_batch=MAX_BATCH):
+	server, task = await start_server(estimator, host, port, socket_path, max_batch)
+	print(f"Serving landmark estimates on {socket_path or f'{host}:{port}'}")
+	try:
+		async with server: await server.serve_forever()
+	finally: task.cancel()
+
+#*******************************************************************************
+
+# Latency and throughput under concurrent load: clients connections each send requests queries one after the other
+# over a Unix socket. Also reports the latency of a direct estimate() call for reference
+async def benchmark(estimator, clients=64, requests=200, seed=42):
+	nodes = estimator.ids.ids.tolist()
+	rng = random.Random(seed)
+	direct = []
+	for _ in range(1000):
+		u, v = rng.sample(nodes, 2)
+		tik = time.perf_counter()
+		estimator.estimate(u, v)
+		direct.append(time.perf_counter() - tik)
+
+	socket_path = os.path.join(tempfile.mkdtemp(), "estimator.sock")
+	server, task = await start_server(estimator, socket_path=socket_path)
+	latencies = []
+	async def client(queries):
+		reader, writer = await asyncio.open_unix_connection(socket_path)
+		for u, v in queries:
+			tik = time.perf_counter()
+			writer.write(f"{u} {v}\n".encode())
+			await writer.drain()
+			await reader.readline()
+			latencies.append(time.perf_counter() - tik)
+		writer.close()
+	workload = [[rng.sample(nodes, 2) for _ in range(requests)] for _ in range(clients)]
+	tik = time.perf_counter()
+	await asyncio.gather(*(client(queries) for queries in workload))
+	elapsed = time.perf_counter() - tik
+	server.close()
+	task.cancel()
+	os.remove(socket_path)
+
+	to_ms = lambda values, q: 1000 * float(np.percentile(values, q))
+	return {"direct_p50_ms": to_ms(direct, 50), "direct_p99_ms": to_ms(direct, 99),
+			"p50_ms": to_ms(latencies, 50), "p95_ms": to_ms(latencies, 95), "p99_ms": to_ms(latencies, 99),
+			"queries_per_s": len(latencies) / elapsed, "mean_batch": len(latencies) / max(server.batcher.batches, 1)}
+
+#*******************************************************************************
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Serve landmark distance estimates from a stored landmark matrix")
+	parser.add_argument("matrix", help="matrix path without suffix, as written by calc_landmark_matrix")
+	parser.add_argument("--landmarks", type=int, default=None, help="number of landmarks to use (all by default)")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of host:port")
+	parser.add_argument("--bench", action="store_true", help="run the concurrent load benchmark and exit")
+	parser.add_argument("--clients", type=int, default=64)
+	parser.add_argument("--requests", type=int, default=200, help="queries per client in the benchmark")
+	args = parser.parse_args()
+
+	estimator = LandmarkEstimator(args.matrix, args.landmarks)
+	if args.bench:
+		for name, value in asyncio.run(benchmark(estimator, args.clients, args.requests)).items(): print(f"{name}: {value:.4f}")
+	else: asyncio.run(serve(estimator, args.host, args.port, args.socket))
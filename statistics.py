@@ -4,6 +4,7 @@ import random
 import matplotlib.pyplot as plt
 import numpy as np
 from igraph import mean
+import engine # CSR based (multi-source) BFS
 
 #*******************************************************************************
 
@@ -17,40 +18,40 @@ def custom_progress_bar(current_step, total_steps):
 		print("", flush=True)
 #*******************************************************************************
 
-# Given the shortest pathlengths from one node to all others, add them to the counting dict
-def count_distanceDistribution(pathlengths, paths_from_current_node):
-	for length in paths_from_current_node: # count pathlengths
-		if length not in pathlengths: pathlengths[length] = 0
-		pathlengths[length] += 1
-	return pathlengths
-
-#*******************************************************************************
-
+# Stream estimates of the distance distribution from BFS searches of a seeded sample of sources (all nodes if the graph
+# is small enough), the searches run on a process pool. After every finished batch of sources it yields the number of
+# sources done, the estimated number of (ordered) node pairs per distance and the half width of their confidence interval
+def StreamDistanceDistribution(G, samplesize=1000, seed=42, processes=None, z=1.96):
+	nrNodes = G.vcount()
+	indptr, indices, weights = engine.graph_to_weighted_csr(G)
+	sources = np.random.default_rng(seed).permutation(nrNodes)[:samplesize]
+	total, squares, done = np.zeros(1), np.zeros(1), 0
+	for hist in engine.distance_histograms(indptr, indices, sources, processes=processes, weights=weights, directed=G.is_directed()):
+		width = max(len(total), hist.shape[1])
+		total, squares = np.pad(total, (0, width-len(total))), np.pad(squares, (0, width-len(squares)))
+		total[:hist.shape[1]] += hist.sum(axis=0)
+		squares[:hist.shape[1]] += (hist.astype(np.float64)**2).sum(axis=0)
+		done += len(hist)
+		per_source = total / done # pairs per source at every distance
+		std = np.sqrt(np.maximum(squares / done - per_source**2, 0))
+		half = np.zeros_like(per_source) if done == nrNodes else z * std / np.sqrt(done) * nrNodes # exact when every node is a source
+		yield done, per_source * nrNodes, half
+
+#------------------------------------------------------------------------------#
 # Making a shortest paths distance distribution (or estimation)
-def DistanceDistribution(G):
-	# Initialize dictionaries
-	shortest_path_lengths = {}
-	pathlengths = {}
-
-	# Get a subset of nodes to make the problem smaller and make an estimate
-	samplesize = 1000 #100000
+# Sampling stops early once every distance holding at least min_share of the pairs is known within a relative tolerance
+def DistanceDistribution(G, samplesize=1000, seed=42, processes=None, tolerance=0.01, min_share=0.01, min_sources=256):
 	print(f"\033[94mCalculating pathlengths\033[0m")
-	nrNodes = G.vcount()
-	att = G.vs.attributes()[0]
-
-	if nrNodes > samplesize: # if G is too large, make an estimate
-		subset_nodes = np.random.choice(list(G.vs[att]), size=samplesize, replace=False)
-	else: subset_nodes = list(G.vs[att])
-
-	# Get all shortest paths
-	for step, node in enumerate(subset_nodes):
-		custom_progress_bar(step+1, len(subset_nodes)) # Progressbar
-		sp_lengths = G.shortest_paths(source=node, mode=ig.ALL)
-		pathlengths = count_distanceDistribution(pathlengths, sp_lengths[0]) # keep dictionary with counts of pathlengths
-
-	del pathlengths[0] # remove the 0 length pathlengths
-	if nrNodes > samplesize: # calculate back estamination by mulitiplying
-		pathlengths = {key: value * nrNodes/samplesize for key, value in pathlengths.items()}
+	nrSources = min(samplesize, G.vcount())
+	for done, counts, half in StreamDistanceDistribution(G, samplesize, seed, processes):
+		custom_progress_bar(done, nrSources) # Progressbar
+		relevant = counts >= min_share * counts.sum()
+		if done >= min_sources and done < nrSources and (half[relevant] <= tolerance * counts[relevant]).all():
+			print(f"\nDistance distribution converged after {done} sources")
+			break
+
+	pathlengths = {length: value for length, value in enumerate(counts) if value > 0}
+	pathlengths.pop(0, None) # remove the 0 length pathlengths
 	return pathlengths
 
 #*******************************************************************************